@@ -0,0 +1,142 @@
+from array import array
+from bisect import bisect_left, insort
+
+
+class FenwickTree:
+    """Prefix sums over a fixed number of slots, O(log n) to add to a slot or sum a prefix"""
+
+    def __init__(self, size):
+        self.size = size
+        self.tree = array('d', bytes(8 * (size + 1)))
+
+    def add(self, index, value):
+        index += 1
+        while index <= self.size:
+            self.tree[index] += value
+            index += index & -index
+
+    def prefix(self, end):
+        """Sum of slots [0, end)"""
+        end = min(end, self.size)
+        total = 0.0
+        while end > 0:
+            total += self.tree[end]
+            end -= end & -end
+        return total
+
+    def range(self, first, end):
+        if end <= first:
+            return 0.0
+        return self.prefix(end) - self.prefix(first)
+
+
+class AggregateCube:
+    """Running amount sums and counts of expenses per (epoch day, category code).
+
+    Adding or removing an expense touches one cell and one slot of its category's
+    prefix sum trees, so the rollups behind the charts stay current without
+    rescanning the expenses. Period totals come from the prefix sums, per-day
+    rollups only visit the days of the period that have expenses.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.day_cells = {}  # day -> {category: [amount, count]}
+        self.days = []  # days with at least one expense, sorted
+        self.origin = 0
+        self.size = 0
+        self.sum_trees = {}
+        self.count_trees = {}
+
+    def add(self, day, category, amount, count=1):
+        """Add `count` expenses of `amount` in total, negative values remove them"""
+        cells = self.day_cells.get(day)
+        if cells is None:
+            cells = self.day_cells[day] = {}
+            insort(self.days, day)
+        cell = cells.setdefault(category, [0.0, 0])
+        cell[0] += amount
+        cell[1] += count
+        if cell[1] <= 0:
+            del cells[category]
+            if not cells:
+                del self.day_cells[day]
+                del self.days[bisect_left(self.days, day)]
+
+        if not self.origin <= day < self.origin + self.size:
+            # The cells already hold the change, the trees are rebuilt around the new day
+            self._resize()
+            return
+        if category not in self.sum_trees:
+            self.sum_trees[category] = FenwickTree(self.size)
+            self.count_trees[category] = FenwickTree(self.size)
+        self.sum_trees[category].add(day - self.origin, amount)
+        self.count_trees[category].add(day - self.origin, count)
+
+    def remove(self, day, category, amount):
+        self.add(day, category, -amount, -1)
+
+    def rebuild(self, rows):
+        """Replace the cube with (day, category, amount) rows"""
+        self.clear()
+        for day, category, amount in rows:
+            cells = self.day_cells.setdefault(day, {})
+            cell = cells.setdefault(category, [0.0, 0])
+            cell[0] += amount
+            cell[1] += 1
+        self.days = sorted(self.day_cells)
+        self._resize()
+
+    def _resize(self):
+        if not self.days:
+            self.origin = self.size = 0
+            self.sum_trees = {}
+            self.count_trees = {}
+            return
+        # Leave room for a year of new days before the trees need rebuilding again
+        self.origin = min(self.origin, self.days[0]) if self.size else self.days[0]
+        self.size = max(self.size, self.days[-1] - self.origin + 366)
+        self.sum_trees = {}
+        self.count_trees = {}
+        for day, cells in self.day_cells.items():
+            for category, (amount, count) in cells.items():
+                if category not in self.sum_trees:
+                    self.sum_trees[category] = FenwickTree(self.size)
+                    self.count_trees[category] = FenwickTree(self.size)
+                self.sum_trees[category].add(day - self.origin, amount)
+                self.count_trees[category].add(day - self.origin, count)
+
+    def _slots(self, since_day, until_day):
+        first = 0 if since_day is None else max(0, since_day - self.origin)
+        end = self.size if until_day is None else max(0, until_day - self.origin)
+        return first, end
+
+    def total(self, since_day=None, until_day=None, category=None):
+        """Amount of the expenses dated in days [since_day, until_day)"""
+        first, end = self._slots(since_day, until_day)
+        trees = self.sum_trees.values() if category is None else [self.sum_trees.get(category)]
+        return sum(tree.range(first, end) for tree in trees if tree)
+
+    def count(self, since_day=None, until_day=None, category=None):
+        first, end = self._slots(since_day, until_day)
+        trees = self.count_trees.values() if category is None else [self.count_trees.get(category)]
+        return round(sum(tree.range(first, end) for tree in trees if tree))
+
+    def totals_by_category(self, since_day=None, until_day=None):
+        """{category: amount} of the categories with expenses in the period"""
+        first, end = self._slots(since_day, until_day)
+        return {category: self.sum_trees[category].range(first, end)
+                for category, tree in self.count_trees.items() if tree.range(first, end) > 0.5}
+
+    def totals_by_day_and_category(self, since_day=None, until_day=None):
+        """([days of the period with expenses], {category: {day: amount}})"""
+        first = 0 if since_day is None else bisect_left(self.days, since_day)
+        end = len(self.days) if until_day is None else bisect_left(self.days, until_day)
+        days = self.days[first:end]
+        by_category = {}
+        for day in days:
+            for category, (amount, _) in self.day_cells[day].items():
+                by_category.setdefault(category, {})[day] = amount
+        return days, by_category
@@ -0,0 +1,91 @@
+I_OWE = "I owe the expense"
+
+
+class BalanceLedger:
+    """Net balance of the user with every counterparty of their shared expenses.
+
+    Each shared expense contributes its share (amount x percentage) to exactly
+    one counterparty: positive when the counterparty owes the user, negative when
+    the user owes. Contributions are kept per expense id, so adding, editing or
+    deleting an expense adjusts a single running balance instead of re-summing
+    every expense for every friend.
+
+    Counterparties are keyed by what the expense itself records: the creator's
+    user id on a copy a friend shared with the user, the friend's email on the
+    user's own copy. `balances_by_friend` maps those keys to friend user ids.
+    A settlement (an expense with 'settles' and 'paid by' user ids) moves the
+    balance with that friend by the amount paid.
+    """
+
+    def __init__(self, user_id=None):
+        self.user_id = user_id
+        self.clear()
+
+    def clear(self):
+        self.contributions = {}  # expense id -> (counterparty key, amount)
+        self.balances = {}  # counterparty key -> net amount owed to the user
+
+    def contribution(self, expense):
+        """(counterparty key, amount) of a shared expense or a settlement, None for anything else"""
+        if expense.get('settles'):
+            try:
+                amount = float(expense.get('amount') or 0)
+            except (TypeError, ValueError):
+                return None
+            return ('uid', expense.get('settles')), amount if expense.get('paid by') == self.user_id else -amount
+
+        shared = expense.get('shared', 'No')
+        if not shared or shared == 'No':
+            return None
+        try:
+            share = float(expense.get('amount') or 0) * float(expense.get('percentage') or 0) * 0.01
+        except (TypeError, ValueError):
+            return None
+
+        if expense.get('user id') and expense.get('user id') != self.user_id:
+            key = ('uid', expense.get('user id'))
+        else:
+            key = ('email', shared)
+        return key, -share if expense.get('owe status') == I_OWE else share
+
+    def _apply(self, key, amount):
+        balance = self.balances.get(key, 0) + amount
+        if abs(balance) < 1e-9:
+            self.balances.pop(key, None)
+        else:
+            self.balances[key] = balance
+
+    def upsert(self, expense):
+        self.delete(expense.get('id'))
+        contribution = self.contribution(expense)
+        if contribution is not None:
+            self.contributions[expense.get('id')] = contribution
+            self._apply(*contribution)
+
+    def delete(self, expense_id):
+        contribution = self.contributions.pop(expense_id, None)
+        if contribution is not None:
+            key, amount = contribution
+            self._apply(key, -amount)
+
+    def sync(self, changed=(), deleted=()):
+        for expense_id in deleted:
+            self.delete(expense_id)
+        for expense in changed:
+            self.upsert(expense)
+
+    def rebuild(self, expenses, user_id=None):
+        if user_id is not None:
+            self.user_id = user_id
+        self.clear()
+        for expense in expenses:
+            self.upsert(expense)
+
+    def balances_by_friend(self, email_to_uid):
+        """{friend user id: net amount the friend owes the user}, negative when the user owes"""
+        by_friend = {}
+        for (kind, value), amount in self.balances.items():
+            friend_id = value if kind == 'uid' else email_to_uid.get(value)
+            if friend_id:
+                by_friend[friend_id] = by_friend.get(friend_id, 0) + amount
+        return by_friend
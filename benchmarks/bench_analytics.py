@@ -0,0 +1,323 @@
+"""Benchmark the analytics of BudgetApp on synthetic data, without a Flet session or Firestore.
+
+The harness builds a real BudgetApp with BudgetApp.__new__, a stub page and no
+database, loads synthetic expenses into it and times its own methods:
+
+    on_expenses_reloaded                derived structures after a full load
+    get_total_expenses                  period total of the budget summary
+    get_weekly_spending_change          this week vs last week
+    get_expenses_by_date_and_category   line chart rollup
+    get_highest_expenses_list           Top Categories card
+    update_shared_expenses              shared balances card
+    update_expenses_list                expenses tab filters and cards
+    edit_one_expense                    one edit as update_expense applies it
+
+A method the measured tree does not have is reported as skipped, so older
+commits can be measured too. Friends come from a fixed list instead of the
+friendships query.
+
+Run from the repository root, e.g.
+
+    python benchmarks/bench_analytics.py --sizes 1000 10000 100000 --output after.json
+    python benchmarks/bench_analytics.py --sizes 1000000 --friends 500 --categories 60
+
+and to compare against another commit, measure a checkout of it with the same harness:
+
+    git worktree add /tmp/before <commit>
+    python benchmarks/bench_analytics.py --root /tmp/before --output before.json
+    python benchmarks/bench_analytics.py --compare before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+USER_ID = "bench-user"
+OWE_STATUSES = ["I owe the expense", "Owes expense"]
+RECURRING = ["No"] * 9 + ["Monthly"]
+
+
+def generate_expenses(count, friends=20, categories=31, shared_ratio=0.2, days=730, seed=42):
+    """Expense dicts shaped like the ones BudgetApp keeps, spread over the last `days` days"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    category_names = [f"Category {i}" for i in range(categories)]
+    friend_emails = [f"friend{i}@example.com" for i in range(friends)]
+    expenses = []
+    for i in range(count):
+        shared = rng.random() < shared_ratio and friends > 0
+        expense = {
+            'id': f"e{i:08d}",
+            'user id': USER_ID,
+            'amount': round(rng.uniform(1, 500), 2),
+            'category': rng.choice(category_names),
+            'description': f"Expense {i}",
+            'date': (now - timedelta(seconds=rng.randrange(days * 86400))).strftime('%Y-%m-%d %H:%M:%S'),
+            'shared': rng.choice(friend_emails) if shared else 'No',
+            'owe status': rng.choice(OWE_STATUSES) if shared else False,
+            'percentage': rng.choice([25, 50, 75]) if shared else 0,
+            'is recurring': rng.choice(RECURRING),
+            'recurring day': None,
+        }
+        if shared and rng.random() < 0.5:
+            # A copy a friend shared with the user
+            expense['user id'] = f"uid{friend_emails.index(expense['shared'])}"
+            expense['shared'] = f"Friend {expense['user id']}"
+        expenses.append(expense)
+    expenses.sort(key=lambda expense: expense['date'], reverse=True)
+    friend_list = [{'userId': f"uid{i}", 'email': email, 'displayName': f"Friend {i}"}
+                   for i, email in enumerate(friend_emails)]
+    return expenses, friend_list, category_names
+
+
+def load_app_module(root):
+    """Import main.py of the tree at `root`, ft.app() only runs when it is the main module"""
+    sys.path.insert(0, root)
+    import main
+    return main
+
+
+class StubPage:
+    """Just enough of ft.Page for BudgetApp methods that render into controls"""
+
+    def __init__(self, flet):
+        self.theme_mode = flet.ThemeMode.LIGHT
+        self.overlay = []
+        self.controls = []
+        self.dialog = None
+        self.snack_bar = None
+
+    def update(self, *controls):
+        pass
+
+    def clean(self):
+        self.controls.clear()
+
+    def add(self, *controls):
+        self.controls.extend(controls)
+
+
+def use_fixed_friends(app_module, friend_list):
+    """Answer the friendships query from `friend_list` for FriendsManager and FriendsDirectory"""
+    import friends_manager
+
+    class FixedFriendsManager:
+        def __init__(self, user_id):
+            self.user_id = user_id
+
+        def get_friends_list(self):
+            return list(friend_list)
+
+    friends_manager.FriendsManager = FixedFriendsManager
+    if hasattr(app_module, 'FriendsManager'):
+        app_module.FriendsManager = FixedFriendsManager
+
+
+def build_app(app_module, expenses, category_names):
+    """A BudgetApp holding `expenses`, set up the way show_main leaves it, without Flet or Firebase"""
+    ft = app_module.ft
+    app = app_module.BudgetApp.__new__(app_module.BudgetApp)
+    app.page = StubPage(ft)
+    app.db = None
+    app.user_id = USER_ID
+    app.currency = "$"
+    app.theme_color = app_module.Themecolors(app.page)
+    if hasattr(app_module, 'RenderScheduler'):
+        app.render = app_module.RenderScheduler(app.page)
+    if hasattr(app, 'init_data_state'):
+        app.init_data_state()
+    else:
+        app.budget_amount = 0
+        app.expenses = []
+        app.wishes = []
+    today = datetime.now().date()
+    app.start_date = today.replace(day=1).strftime("%Y-%m-%d")
+    app.end_date = (today.replace(day=1) + timedelta(days=31)).replace(day=1).strftime("%Y-%m-%d")
+    app.budget_amount = 5000
+    app.expenses = expenses
+
+    if hasattr(app, 'create_list_views'):
+        app.create_list_views()
+    else:
+        app.expenses_list = ft.ListView()
+    app.expenses_tab = ft.Container()
+    app.category_filter = ft.Dropdown(value=category_names[0])
+    app.time_period_filter = ft.Dropdown(value="3M")
+    app.occurence_filter = ft.Dropdown(value="Not Periodic")
+    return app
+
+
+class AnalyticsHarness:
+    """Times the BudgetApp methods of one tree on one synthetic data set"""
+
+    def __init__(self, app_module, expenses, friend_list, category_names):
+        use_fixed_friends(app_module, friend_list)
+        self.app = build_app(app_module, expenses, category_names)
+
+    def call(self, name, *args):
+        method = getattr(self.app, name, None)
+        if method is None:
+            return None
+        return lambda: method(*args)
+
+    def uncached(self, name):
+        """Time the computation itself, not a snapshot BudgetMetrics kept from the previous call"""
+        method = getattr(self.app, name)
+        metrics = getattr(self.app, 'budget_metrics', None)
+
+        def run():
+            if metrics is not None:
+                metrics.invalidate()
+            return method()
+        return run
+
+    def edit_one_expense(self):
+        """One edit as update_expense applies it: the dict changes and the derived structures follow"""
+        expense = self.app.expenses[len(self.app.expenses) // 2]
+        expense['amount'] = 123.45 if expense['amount'] != 123.45 else 54.32
+        if hasattr(self.app, 'on_expenses_changed'):
+            self.app.on_expenses_changed([expense])
+
+    def benchmarks(self):
+        """{name: function or None when the tree does not have the method}"""
+        return {
+            'get_total_expenses': self.uncached('get_total_expenses'),
+            'get_weekly_spending_change': self.uncached('get_weekly_spending_change'),
+            'get_expenses_by_date_and_category': self.call('get_expenses_by_date_and_category', '12M'),
+            'get_highest_expenses_list': self.call('get_highest_expenses_list'),
+            'update_shared_expenses': self.call('update_shared_expenses'),
+            'update_expenses_list': self.call('update_expenses_list'),
+            'edit_one_expense': self.edit_one_expense,
+        }
+
+
+def measure(function, repeat):
+    """(timings in ms, peak traced memory in KiB of one call)"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return timings, peak / 1024
+
+
+def summarize(timings, peak_kib):
+    return {
+        'min_ms': round(min(timings), 4),
+        'median_ms': round(statistics.median(timings), 4),
+        'max_ms': round(max(timings), 4),
+        'peak_kib': round(peak_kib, 1),
+    }
+
+
+def bench_size(app_module, size, friends, categories, repeat):
+    expenses, friend_list, category_names = generate_expenses(size, friends, categories)
+    harness = AnalyticsHarness(app_module, expenses, friend_list, category_names)
+
+    results = {}
+    reload = harness.call('on_expenses_reloaded')
+    if reload:
+        # A rebuild is slow at large sizes, it is timed once and traced once
+        timings, peak = measure(reload, 1)
+        results['on_expenses_reloaded'] = summarize(timings, peak)
+    else:
+        results['on_expenses_reloaded'] = None
+
+    for name, function in harness.benchmarks().items():
+        if function is None:
+            results[name] = None
+            continue
+        timings, peak = measure(function, repeat)
+        results[name] = summarize(timings, peak)
+    return results
+
+
+def git_commit(root):
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=root, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(report):
+    for size, results in report['results'].items():
+        print(f"\n{int(size):,} expenses, {report['friends']} friends, {report['categories']} categories")
+        for name, stats in results.items():
+            if stats is None:
+                print(f"   {name:<36} skipped, not in this tree")
+                continue
+            print(f"   {name:<36} median {stats['median_ms']:>10.3f} ms   min {stats['min_ms']:>10.3f} ms"
+                  f"   peak {stats['peak_kib']:>10.1f} KiB")
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before.get('commit')} -> {after.get('commit')} (median ms, ratio after/before)")
+    for size, results in after['results'].items():
+        if size not in before['results']:
+            continue
+        print(f"\n{int(size):,} expenses")
+        for name, stats in results.items():
+            old = before['results'][size].get(name)
+            if not old or not stats:
+                continue
+            ratio = stats['median_ms'] / old['median_ms'] if old['median_ms'] else float('inf')
+            print(f"   {name:<36} {old['median_ms']:>10.3f} -> {stats['median_ms']:>10.3f}   x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--root', default=REPO_ROOT, help="tree whose main.py is measured (default: this one)")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--friends', type=int, default=20)
+    parser.add_argument('--categories', type=int, default=31)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="compare two JSON results")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    root = os.path.abspath(args.root)
+    app_module = load_app_module(root)
+    report = {
+        'commit': git_commit(root),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'friends': args.friends,
+        'categories': args.categories,
+        'repeat': args.repeat,
+        'results': {},
+    }
+    for size in args.sizes:
+        report['results'][str(size)] = bench_size(app_module, size, args.friends, args.categories, args.repeat)
+
+    print_results(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Benchmark debt simplification against settling every pair of friends separately.
+
+Run from the repository root:
+
+    python benchmarks/bench_debt_simplifier.py [group size] [debts]
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from debt_simplifier import net_balances, pairwise_settlements, simplify_debts
+
+
+def random_debts(group_size, count, seed=7):
+    rng = random.Random(seed)
+    people = [f"friend{i}" for i in range(group_size)]
+    debts = []
+    for _ in range(count):
+        debtor, creditor = rng.sample(people, 2)
+        debts.append((debtor, creditor, rng.randint(100, 50000) / 100))
+    return debts
+
+
+def check(debts, settlements):
+    """Every net balance must be exactly settled"""
+    remaining = net_balances(debts)
+    for debtor, creditor, amount in settlements:
+        remaining[debtor] += amount
+        remaining[creditor] -= amount
+    assert all(abs(amount) < 0.01 * len(remaining) for amount in remaining.values()), remaining
+
+
+def bench(group_size, count, repeat=200):
+    debts = random_debts(group_size, count)
+
+    simplified = simplify_debts(net_balances(debts))
+    pairwise = pairwise_settlements(debts)
+    check(debts, simplified)
+    check(debts, pairwise)
+
+    simplified_time = min(timeit.repeat(lambda: simplify_debts(net_balances(debts)), number=1, repeat=repeat))
+    pairwise_time = min(timeit.repeat(lambda: pairwise_settlements(debts), number=1, repeat=repeat))
+    print(f"{group_size:>4} people {count:>6} debts | "
+          f"simplified {len(simplified):>4} transfers in {simplified_time * 1000:.3f} ms | "
+          f"pairwise {len(pairwise):>5} transfers in {pairwise_time * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        bench(int(sys.argv[1]), int(sys.argv[2]) if len(sys.argv) > 2 else 10 * int(sys.argv[1]))
+    else:
+        for group_size, count in [(5, 20), (10, 100), (50, 200), (50, 1000), (200, 5000)]:
+            bench(group_size, count)
@@ -0,0 +1,65 @@
+from expense_ledger import ExpenseLedger
+
+
+class BudgetSnapshot:
+    """The numbers the overview cards show for one budget period, computed together"""
+
+    __slots__ = ('total_expenses', 'remaining_budget', 'used_percent', 'days_elapsed', 'days_remaining',
+                 'daily_average', 'this_week_total', 'last_week_total', 'weekly_change')
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values[name])
+
+
+class BudgetMetrics:
+    """Budget period metrics of an ExpenseLedger, recomputed once per change.
+
+    The progress card, the quick insights row and the budget summary all read
+    the same snapshot. It is rebuilt when the ledger's version, the budget
+    period, the budget amount or the day changes, every other read is a lookup.
+    """
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self._key = None
+        self._snapshot = None
+
+    def invalidate(self):
+        self._key = None
+
+    def snapshot(self, start_date, end_date, budget_amount, fallback_total=None):
+        """Metrics of the period [start_date, end_date], `fallback_total` replaces the ledger's period total"""
+        today = ExpenseLedger.today()
+        key = (self.ledger.version, start_date, end_date, budget_amount, fallback_total, today)
+        if key != self._key:
+            self._snapshot = self._compute(start_date, end_date, budget_amount, fallback_total, today)
+            self._key = key
+        return self._snapshot
+
+    def _compute(self, start_date, end_date, budget_amount, fallback_total, today):
+        start_day = ExpenseLedger.day_of(start_date)
+        end_day = ExpenseLedger.day_of(end_date)
+
+        if fallback_total is not None:
+            total_expenses = fallback_total
+        else:
+            total_expenses = self.ledger.total(since_day=start_day, flag=ExpenseLedger.COUNTED)
+        days_elapsed = today - start_day
+
+        # Epoch day 0 was a Thursday, weeks start on Monday
+        week_start = today - (today + 3) % 7
+        this_week_total = self.ledger.cube.total(since_day=week_start, until_day=today + 1)
+        last_week_total = self.ledger.cube.total(since_day=week_start - 7, until_day=week_start)
+
+        return BudgetSnapshot(
+            total_expenses=total_expenses,
+            remaining_budget=budget_amount - total_expenses,
+            used_percent=(total_expenses / budget_amount) * 100 if budget_amount > 0 else 0,
+            days_elapsed=days_elapsed,
+            days_remaining=end_day - today,
+            daily_average=total_expenses / days_elapsed if days_elapsed > 0 else 0,
+            this_week_total=this_week_total,
+            last_week_total=last_week_total,
+            weekly_change=this_week_total - last_week_total,
+        )
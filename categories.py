@@ -0,0 +1,84 @@
+import flet as ft
+
+# (group, [(category, chart and badge color, icon)]) in the order the category dropdowns list them
+CATEGORY_GROUPS = [
+    ("Essential Living", [
+        ("Groceries", ft.colors.GREEN_400, ft.icons.SHOPPING_CART),
+        ("Housing", ft.colors.BLUE_400, ft.icons.HOME),
+        ("Utilities", ft.colors.ORANGE_600, ft.icons.BOLT),
+        ("Transportation", ft.colors.TEAL_600, ft.icons.DIRECTIONS_CAR),
+        ("Insurance", ft.colors.BLUE_GREY_600, ft.icons.SECURITY),
+        ("Healthcare", ft.colors.LIGHT_GREEN_800, ft.icons.LOCAL_HOSPITAL),
+    ]),
+    ("Personal Care", [
+        ("Personal Care", ft.colors.PINK_300, ft.icons.FACE),
+        ("Clothing", ft.colors.PURPLE_300, ft.icons.CHECKROOM),
+        ("Fitness", ft.colors.DEEP_PURPLE_400, ft.icons.FITNESS_CENTER),
+    ]),
+    ("Food & Dining", [
+        ("Dining Out", ft.colors.ORANGE_300, ft.icons.RESTAURANT),
+        ("Coffee", ft.colors.BROWN_300, ft.icons.COFFEE),
+        ("Snacks", ft.colors.YELLOW_600, ft.icons.FASTFOOD),
+    ]),
+    ("Entertainment & Leisure", [
+        ("Entertainment", ft.colors.DEEP_ORANGE_ACCENT_400, ft.icons.MOVIE),
+        ("Hobbies", ft.colors.INDIGO_300, ft.icons.PALETTE),
+        ("Books", ft.colors.BLUE_GREY_400, ft.icons.BOOK),
+        ("Gaming", ft.colors.DEEP_PURPLE_400, ft.icons.SPORTS_ESPORTS),
+    ]),
+    ("Technology", [
+        ("Digital Services", ft.colors.BLUE_500, ft.icons.CLOUD),
+        ("Electronics", ft.colors.CYAN_500, ft.icons.DEVICES),
+        ("Software", ft.colors.LIGHT_BLUE_500, ft.icons.COMPUTER),
+    ]),
+    ("Family & Social", [
+        ("Childcare", ft.colors.YELLOW_400, ft.icons.CHILD_CARE),
+        ("Education", ft.colors.LIGHT_GREEN_500, ft.icons.SCHOOL),
+        ("Gifts", ft.colors.PINK_400, ft.icons.CARD_GIFTCARD),
+        ("Pet Care", ft.colors.BROWN_200, ft.icons.PETS),
+    ]),
+    ("Special Occasions", [
+        ("Travel", ft.colors.TEAL_400, ft.icons.FLIGHT),
+        ("Events", ft.colors.DEEP_ORANGE_300, ft.icons.CELEBRATION),
+        ("Charity", ft.colors.LIGHT_GREEN_400, ft.icons.VOLUNTEER_ACTIVISM),
+    ]),
+    ("Financial", [
+        ("Savings", ft.colors.GREEN_500, ft.icons.SAVINGS),
+        ("Investments", ft.colors.GREEN_700, ft.icons.TRENDING_UP),
+        ("Debt Payment", ft.colors.RED_500, ft.icons.PAYMENT),
+    ]),
+    ("Miscellaneous", [
+        ("Emergency", ft.colors.RED_600, ft.icons.WARNING),
+        ("Other", ft.colors.GREY_500, ft.icons.MORE_HORIZ),
+    ]),
+]
+
+DEFAULT_CATEGORY_ICON = ft.icons.MONEY
+
+# Category names, colors and icons indexed by category code
+CATEGORIES = tuple(name for _, categories in CATEGORY_GROUPS for name, _, _ in categories)
+CATEGORY_CODES = {name: code for code, name in enumerate(CATEGORIES)}
+CATEGORY_COLORS = tuple(color for _, categories in CATEGORY_GROUPS for _, color, _ in categories)
+CATEGORY_ICONS = tuple(icon for _, categories in CATEGORY_GROUPS for _, _, icon in categories)
+
+# (text, key, disabled) of every category dropdown entry, group headers included
+CATEGORY_OPTION_SPECS = tuple(
+    spec
+    for group_name, categories in CATEGORY_GROUPS
+    for spec in [(f"--- {group_name} ---", None, True)] + [(name, name, False) for name, _, _ in categories]
+)
+
+
+def category_color(category, default=ft.colors.GREY_500):
+    code = CATEGORY_CODES.get(category)
+    return default if code is None else CATEGORY_COLORS[code]
+
+
+def category_icon(category, default=DEFAULT_CATEGORY_ICON):
+    code = CATEGORY_CODES.get(category)
+    return default if code is None else CATEGORY_ICONS[code]
+
+
+def category_dropdown_options():
+    """Fresh dropdown options for the category pickers, a Flet control can only sit in one dropdown"""
+    return [ft.dropdown.Option(text=text, key=key, disabled=disabled) for text, key, disabled in CATEGORY_OPTION_SPECS]
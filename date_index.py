@@ -0,0 +1,94 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+class DateIndex:
+    """Ids of expenses or wishes kept sorted by their epoch second.
+
+    A "last N days" or "since start date" query is a bisect to the first row of
+    the period and a slice from there, instead of comparing the date of every
+    entry. Inserts, edits and deletes move a single row, so the index is kept in
+    place rather than re-sorted after a change.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.ids = []
+        self.seconds = array('q')
+        self.id_seconds = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, item_id):
+        return item_id in self.id_seconds
+
+    def rebuild(self, entries):
+        """Replace the index with (id, second) entries, the first entry of a repeated id wins"""
+        self.clear()
+        rows = []
+        for item_id, second in entries:
+            if second is not None and item_id not in self.id_seconds:
+                self.id_seconds[item_id] = second
+                rows.append((second, item_id))
+        rows.sort(key=lambda row: row[0])
+        self.seconds.extend(second for second, _ in rows)
+        self.ids = [item_id for _, item_id in rows]
+
+    def find(self, item_id):
+        """Row of `item_id`, None if it is not indexed"""
+        second = self.id_seconds.get(item_id)
+        if second is None:
+            return None
+        row = bisect_left(self.seconds, second)
+        # Several entries can share a second
+        while self.ids[row] != item_id:
+            row += 1
+        return row
+
+    def insert(self, item_id, second):
+        """Index a new id after the entries of the same second and return its row"""
+        row = bisect_right(self.seconds, second)
+        self.ids.insert(row, item_id)
+        self.seconds.insert(row, second)
+        self.id_seconds[item_id] = second
+        return row
+
+    def remove(self, item_id):
+        """Drop `item_id` and return the row it had, None if it was not indexed"""
+        row = self.find(item_id)
+        if row is not None:
+            del self.id_seconds[item_id]
+            del self.ids[row]
+            del self.seconds[row]
+        return row
+
+    def upsert(self, item_id, second):
+        """Index `item_id` at `second` (None removes it), returns (old row, new row)"""
+        if second is not None and self.id_seconds.get(item_id) == second:
+            row = self.find(item_id)
+            return row, row
+        old_row = self.remove(item_id)
+        new_row = self.insert(item_id, second) if second is not None else None
+        return old_row, new_row
+
+    def rows_between(self, since_second=None, until_second=None, after_second=None):
+        """(first, end) rows with since_second <= second < until_second and second > after_second"""
+        first = 0
+        end = len(self.ids)
+        if since_second is not None:
+            first = bisect_left(self.seconds, since_second)
+        if after_second is not None:
+            first = max(first, bisect_right(self.seconds, after_second))
+        if until_second is not None:
+            end = bisect_left(self.seconds, until_second)
+        return first, max(first, end)
+
+    def ids_between(self, since_second=None, until_second=None, after_second=None, newest_first=False):
+        first, end = self.rows_between(since_second, until_second, after_second)
+        ids = self.ids[first:end]
+        if newest_first:
+            ids.reverse()
+        return ids
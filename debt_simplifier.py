@@ -0,0 +1,76 @@
+import heapq
+
+
+def net_balances(debts):
+    """{person: net amount} of (debtor, creditor, amount) debts, positive when the person is owed money"""
+    balances = {}
+    for debtor, creditor, amount in debts:
+        balances[debtor] = balances.get(debtor, 0) - amount
+        balances[creditor] = balances.get(creditor, 0) + amount
+    return balances
+
+
+def pairwise_settlements(debts):
+    """[(debtor, creditor, amount)] settling every pair of people separately, the naive way"""
+    pairs = {}
+    for debtor, creditor, amount in debts:
+        if (creditor, debtor) in pairs:
+            pairs[(creditor, debtor)] -= amount
+        else:
+            pairs[(debtor, creditor)] = pairs.get((debtor, creditor), 0) + amount
+
+    settlements = []
+    for (debtor, creditor), amount in pairs.items():
+        cents = round(amount * 100)
+        if cents > 0:
+            settlements.append((debtor, creditor, cents / 100))
+        elif cents < 0:
+            settlements.append((creditor, debtor, -cents / 100))
+    return settlements
+
+
+def simplify_debts(balances):
+    """[(debtor, creditor, amount)] that settles every net balance of a group.
+
+    Works in whole cents. Debtors and creditors whose balances cancel exactly are
+    paired first, the rest is netted greedily by always settling the largest
+    debt against the largest credit, which needs at most one transfer less than
+    the number of people with a balance. Cycles like A owes B, B owes C, C owes A
+    disappear because only the net balances are settled.
+    """
+    creditors = []
+    debtors = []
+    for person, amount in balances.items():
+        cents = round(amount * 100)
+        if cents > 0:
+            creditors.append((-cents, person))
+        elif cents < 0:
+            debtors.append((cents, person))
+
+    settlements = []
+
+    # A debt that matches a credit exactly settles both in one transfer
+    credits_by_amount = {}
+    for cents, person in creditors:
+        credits_by_amount.setdefault(-cents, []).append(person)
+    remaining_debtors = []
+    for cents, person in debtors:
+        matches = credits_by_amount.get(-cents)
+        if matches:
+            settlements.append((person, matches.pop(), -cents / 100))
+        else:
+            remaining_debtors.append((cents, person))
+    remaining_creditors = [(-cents, person) for cents, people in credits_by_amount.items() for person in people]
+
+    heapq.heapify(remaining_creditors)
+    heapq.heapify(remaining_debtors)
+    while remaining_creditors and remaining_debtors:
+        credit, creditor = heapq.heappop(remaining_creditors)
+        debt, debtor = heapq.heappop(remaining_debtors)
+        cents = min(-credit, -debt)
+        settlements.append((debtor, creditor, cents / 100))
+        if credit + cents < 0:
+            heapq.heappush(remaining_creditors, (credit + cents, creditor))
+        if debt + cents < 0:
+            heapq.heappush(remaining_debtors, (debt + cents, debtor))
+    return settlements
@@ -0,0 +1,201 @@
+import heapq
+from array import array
+from datetime import date, datetime
+from itertools import compress
+
+from aggregate_cube import AggregateCube
+from date_index import DateIndex
+from expense_records import EPOCH_ORDINAL, SECONDS_PER_DAY, ExpenseRecord, day_key, epoch_day, epoch_seconds
+from top_expenses import TopExpenses
+
+
+class ExpenseLedger:
+    """Columnar copy of the expenses that the overview and the charts aggregate over.
+
+    Every expense is one row across parallel `array` columns (day, amount, category
+    code, flags) kept in the order of its DateIndex, so a period query is a bisect
+    to the first row of the period followed by a reduction over packed arrays,
+    instead of parsing date strings and looking up dict keys across the whole
+    history. The chart rollups by day and category come from an AggregateCube that
+    is kept in step with the rows. The expense dicts stay the source of truth for
+    rendering and syncing, the ledger is updated from them by id.
+    """
+
+    COUNTED = 1  # counts against the budget, same rule as BudgetApp.get_total_expenses
+    SHARED = 2
+    RECURRING = 4
+
+    def __init__(self, user_id=None, categories=()):
+        self.user_id = user_id
+        # `categories` keep their position as code, e.g. the category registry's codes
+        self.category_names = list(categories)
+        self.category_codes = {name: code for code, name in enumerate(self.category_names)}
+        self.version = 0  # bumped on every change, lets readers cache what they derive
+        self.clear()
+
+    def clear(self):
+        self.index = DateIndex()
+        self.cube = AggregateCube()
+        self.top = TopExpenses()
+        self.days = array('l')
+        self.amounts = array('d')
+        self.categories = array('H')
+        self.flags = array('B')
+
+    @property
+    def columns(self):
+        return self.days, self.amounts, self.categories, self.flags
+
+    @property
+    def ids(self):
+        return self.index.ids
+
+    @property
+    def seconds(self):
+        return self.index.seconds
+
+    def __len__(self):
+        return len(self.index)
+
+    def rebuild(self, expenses, user_id=None):
+        if user_id is not None:
+            self.user_id = user_id
+        self.clear()
+        self.version += 1
+
+        rows = {}
+        for expense in expenses:
+            values = self.encode(expense)
+            if values is not None and expense.get('id') not in rows:
+                rows[expense.get('id')] = values
+        rows = sorted(rows.items(), key=lambda row: row[1][0])
+
+        self.index.rebuild((expense_id, values[0]) for expense_id, values in rows)
+        for index, column in enumerate(self.columns, start=1):
+            column.extend(values[index] for _, values in rows)
+        self.cube.rebuild(zip(self.days, self.categories, self.amounts))
+        self.top.rebuild(zip(self.days, self.ids, self.amounts))
+
+    def category_code(self, category):
+        code = self.category_codes.get(category)
+        if code is None:
+            code = len(self.category_names)
+            self.category_codes[category] = code
+            self.category_names.append(category)
+        return code
+
+    def encode(self, expense):
+        """Return the (second, day, amount, category code, flags) row of an expense, None if it has no date"""
+        record = ExpenseRecord(expense)
+        if record.date is None:
+            return None
+
+        flags = 0
+        if expense.get('shared') == 'No' or expense.get('owe status') is not True and \
+                expense.get('user id') == self.user_id:
+            flags |= self.COUNTED
+        if expense.get('shared', 'No') != 'No':
+            flags |= self.SHARED
+        if expense.get('is recurring', 'No') != 'No':
+            flags |= self.RECURRING
+
+        return (record.second, record.day, float(expense.get('amount') or 0),
+                self.category_code(expense.get('category', '')), flags)
+
+    def upsert(self, expense):
+        self.version += 1
+        values = self.encode(expense)
+        expense_id = expense.get('id')
+        old_row, new_row = self.index.upsert(expense_id, values[0] if values else None)
+        if old_row is not None:
+            self.cube.remove(self.days[old_row], self.categories[old_row], self.amounts[old_row])
+            self.top.remove(self.days[old_row], expense_id, self.amounts[old_row])
+        if new_row is not None:
+            self.cube.add(values[1], values[3], values[2])
+            self.top.add(values[1], expense_id, values[2])
+
+        if old_row is not None and old_row == new_row:
+            for column, value in zip(self.columns, values[1:]):
+                column[new_row] = value
+            return
+        if old_row is not None:
+            for column in self.columns:
+                del column[old_row]
+        if new_row is not None:
+            for column, value in zip(self.columns, values[1:]):
+                column.insert(new_row, value)
+
+    def delete(self, expense_id):
+        self.version += 1
+        row = self.index.remove(expense_id)
+        if row is not None:
+            self.cube.remove(self.days[row], self.categories[row], self.amounts[row])
+            self.top.remove(self.days[row], expense_id, self.amounts[row])
+            for column in self.columns:
+                del column[row]
+
+    def sync(self, changed=(), deleted=()):
+        for expense_id in deleted:
+            self.delete(expense_id)
+        for expense in changed:
+            self.upsert(expense)
+
+    def rows_between(self, since_day=None, until_day=None, after_second=None):
+        """(first, end) rows of days [since_day, until_day) with seconds > after_second"""
+        return self.index.rows_between(since_day * SECONDS_PER_DAY if since_day is not None else None,
+                                       until_day * SECONDS_PER_DAY if until_day is not None else None,
+                                       after_second)
+
+    def ids_between(self, since_day=None, until_day=None, after_second=None, newest_first=False):
+        """Expense ids of the selected rows in date order"""
+        first, end = self.rows_between(since_day, until_day, after_second)
+        ids = self.ids[first:end]
+        if newest_first:
+            ids.reverse()
+        return ids
+
+    def total(self, since_day=None, until_day=None, after_second=None, flag=None):
+        first, end = self.rows_between(since_day, until_day, after_second)
+        amounts = self.amounts[first:end]
+        if flag is None:
+            return sum(amounts)
+        return sum(compress(amounts, map(flag.__and__, self.flags[first:end])))
+
+    def totals_by_category(self, since_day=None, until_day=None):
+        """{category: amount} of the expenses dated in days [since_day, until_day)"""
+        totals = self.cube.totals_by_category(since_day, until_day)
+        return {self.category_names[code]: amount for code, amount in totals.items()}
+
+    def top_categories(self, k, since_day=None, until_day=None):
+        """[(category, amount)] of the `k` categories with the highest totals in the period"""
+        totals = self.cube.totals_by_category(since_day, until_day)
+        return [(self.category_names[code], amount)
+                for code, amount in heapq.nlargest(k, totals.items(), key=lambda item: item[1])]
+
+    def largest_expenses(self, k, since_day=None, until_day=None):
+        """[(expense id, amount)] of the `k` largest expenses in the period"""
+        return self.top.largest(k, since_day, until_day)
+
+    def totals_by_day_and_category(self, since_day=None, until_day=None):
+        """({category: {'%Y-%m-%d': amount}}, sorted day keys) of the period, missing days filled with 0"""
+        days, by_category = self.cube.totals_by_day_and_category(since_day, until_day)
+        keys = [day_key(day) for day in days]
+        result = {}
+        for code, category_days in by_category.items():
+            result[self.category_names[code]] = {key: category_days.get(day, 0) for day, key in zip(days, keys)}
+        return result, keys
+
+    @staticmethod
+    def today():
+        return epoch_day(datetime.now())
+
+    @staticmethod
+    def seconds_ago(delta):
+        return epoch_seconds(datetime.now() - delta)
+
+    @staticmethod
+    def day_of(value):
+        """Epoch day of a '%Y-%m-%d' string or a date"""
+        if isinstance(value, str):
+            value = date.fromisoformat(value[:10])
+        return value.toordinal() - EPOCH_ORDINAL
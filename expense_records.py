@@ -0,0 +1,55 @@
+from datetime import date, datetime
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+SECONDS_PER_DAY = 86400
+
+
+def parse_expense_date(value):
+    """Parse an expense 'date' ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d' or a datetime), None if it is not a date"""
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return None
+
+
+def epoch_seconds(value):
+    """Seconds since 1970-01-01 of a naive local datetime, without any timezone conversion"""
+    return ((value.toordinal() - EPOCH_ORDINAL) * SECONDS_PER_DAY
+            + value.hour * 3600 + value.minute * 60 + value.second)
+
+
+def epoch_day(value):
+    return value.toordinal() - EPOCH_ORDINAL
+
+
+def day_key(day):
+    """'%Y-%m-%d' of an epoch day"""
+    return date.fromordinal(day + EPOCH_ORDINAL).isoformat()
+
+
+class ExpenseRecord:
+    """Typed view of an expense or wish dict, parsed once when it is loaded or changed.
+
+    'date' and 'recurring day' are stored as strings or datetimes depending on who
+    wrote them, the record holds them as datetimes plus epoch day and second ints so
+    filters compare integers. Fields are None when the dict has no valid value.
+    """
+
+    __slots__ = ('id', 'date', 'day', 'second', 'recurring_day', 'recurring_second')
+
+    def __init__(self, data):
+        self.id = data.get('id')
+        self.date = parse_expense_date(data.get('date'))
+        self.day = epoch_day(self.date) if self.date else None
+        self.second = epoch_seconds(self.date) if self.date else None
+        self.recurring_day = parse_expense_date(data.get('recurring day'))
+        self.recurring_second = epoch_seconds(self.recurring_day) if self.recurring_day else None
+
+
+def build_records(items):
+    """{id: ExpenseRecord} of expense or wish dicts"""
+    return {item.get('id'): ExpenseRecord(item) for item in items}
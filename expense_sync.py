@@ -0,0 +1,204 @@
+from datetime import datetime, timezone
+from firebase_admin import firestore
+from google.cloud import firestore as fire
+
+from write_queue import set_write
+
+
+# Every expense and tombstone write carries the server's commit time in this field.
+# The `timestamp` field is the writer's naive local time, which differs between time
+# zones and clocks, so the sync cursors and the snapshot listeners only use this one.
+UPDATED_AT = 'updated_at'
+
+
+def expense_write(path, data):
+    """Merge write of expense `data`, stamped with the server time the sync cursors follow"""
+    return set_write(path, {**data, UPDATED_AT: firestore.SERVER_TIMESTAMP}, merge=True)
+
+
+def timestamp_key(value):
+    """Sort key for expense timestamps that mixes naive and tz-aware datetimes.
+
+    Firestore stores the naive `datetime.now()` values written by the app as UTC,
+    so naive values are read the same way to keep local and loaded entries in order.
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            return 0.0
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return 0.0
+
+
+class ExpenseSyncEngine:
+    """Keeps an in-memory expense list in step with users/{uid}/expenses.
+
+    The first sync streams the whole collection; later syncs only fetch documents
+    whose `updated_at` is at or after the last one seen, plus tombstones written for
+    deletes. `updated_at` is set by the server on every write (see expense_write), so
+    the cursors do not depend on the clocks or time zones of the writers.
+    """
+
+    def __init__(self, db, user_id, store=None):
+        self.db = db
+        self.user_id = user_id
+        self.store = store
+        self.cursor = None
+        self.tombstone_cursor = None
+
+        if self.store:
+            state = self.store.get_document(self.user_id, 'expense_sync', {})
+            # Cursors saved before they followed updated_at start over with a full load
+            if state.get('field') == UPDATED_AT:
+                self.cursor = state.get('cursor')
+                self.tombstone_cursor = state.get('tombstone_cursor')
+
+    @property
+    def expenses_ref(self):
+        return self.db.collection('users').document(self.user_id).collection('expenses')
+
+    @property
+    def tombstones_ref(self):
+        return self.db.collection('users').document(self.user_id).collection('expense_tombstones')
+
+    def reset(self):
+        """Forget the cursors so the next sync streams the full collection"""
+        self.cursor = None
+        self.tombstone_cursor = None
+        self.save_state()
+
+    def save_state(self):
+        if self.store:
+            self.store.set_document(self.user_id, 'expense_sync', {
+                'field': UPDATED_AT,
+                'cursor': self.cursor,
+                'tombstone_cursor': self.tombstone_cursor
+            })
+
+    def fetch_changes(self):
+        """Return (changed expense dicts, deleted expense ids) since the last sync"""
+        if self.cursor is None:
+            # Not ordered by updated_at, that would leave out documents written before it existed
+            query = self.expenses_ref
+        else:
+            query = self.expenses_ref.where(filter=fire.FieldFilter(UPDATED_AT, '>=', self.cursor))
+
+        changed = []
+        for doc in query.stream():
+            expense_data = doc.to_dict()
+            expense_data['id'] = doc.id
+            changed.append(expense_data)
+        self.advance_cursors(changed)
+
+        deleted = []
+        if self.tombstone_cursor is None:
+            # A full load never returns deleted documents, so only tombstones committed after the
+            # newest document it saw matter. Without one the next sync reads every tombstone, apply()
+            # drops the ids it does not hold.
+            self.tombstone_cursor = self.cursor
+            return changed, deleted
+
+        tombstones = self.tombstones_ref.where(filter=fire.FieldFilter(UPDATED_AT, '>=', self.tombstone_cursor))
+        deleted_at = []
+        for doc in tombstones.stream():
+            deleted.append(doc.id)
+            deleted_at.append(doc.to_dict().get(UPDATED_AT))
+        self.advance_cursors(deleted_at=deleted_at)
+
+        return changed, deleted
+
+    def advance_cursors(self, changed=(), deleted_at=()):
+        """Move the cursors to the newest server times of the expenses and tombstones seen"""
+        for expense in changed:
+            stamp = expense.get(UPDATED_AT)
+            if isinstance(stamp, datetime) and (self.cursor is None or timestamp_key(stamp) > timestamp_key(self.cursor)):
+                self.cursor = stamp
+        for stamp in deleted_at:
+            if isinstance(stamp, datetime) and (self.tombstone_cursor is None or
+                                                timestamp_key(stamp) > timestamp_key(self.tombstone_cursor)):
+                self.tombstone_cursor = stamp
+
+    def merge(self, expenses, changed, deleted):
+        """Merge changed documents and tombstones into `expenses`, newest first"""
+        deleted_ids = set(deleted)
+        # A document re-created after its tombstone (e.g. a friend re-sharing it) wins
+        deleted_ids.difference_update(expense['id'] for expense in changed)
+
+        merged = {expense.get('id'): expense for expense in expenses if expense.get('id') not in deleted_ids}
+        for expense in changed:
+            merged[expense['id']] = expense
+
+        return sorted(merged.values(), key=lambda expense: timestamp_key(expense.get('timestamp')), reverse=True)
+
+    def sync(self, expenses):
+        """Fetch and merge changes, returning (merged list, changed dicts, deleted ids)"""
+        full_load = self.cursor is None
+        changed, deleted = self.fetch_changes()
+        return self.apply_fetched(expenses, changed, deleted, full_load)
+
+    def apply_fetched(self, expenses, changed, deleted, full_load):
+        """Merge what fetch_changes returned, a full load replaces `expenses` and the store"""
+        if full_load:
+            # The full stream is authoritative, drop whatever was cached before it
+            merged = self.merge([], changed, deleted)
+            if self.store:
+                self.store.replace_collection('expenses', self.user_id, merged)
+            # Cursors are saved after the data so an interrupted sync is simply fetched again
+            self.save_state()
+            return merged, changed, deleted
+
+        return self.apply(expenses, changed, deleted)
+
+    def apply(self, expenses, changed, deleted):
+        """Merge a delta into `expenses` and the store, returning (merged list, changed dicts, deleted ids).
+
+        Entries identical to what is already held and deletions of unknown ids are
+        dropped from the returned delta, so callers only re-render what really changed.
+        """
+        current = {expense.get('id'): expense for expense in expenses}
+        changed = [expense for expense in changed if current.get(expense['id']) != expense]
+        deleted = [expense_id for expense_id in dict.fromkeys(deleted) if expense_id in current]
+
+        if changed or deleted:
+            merged = self.merge(expenses, changed, deleted)
+            if self.store:
+                self.store.upsert('expenses', self.user_id, changed)
+                self.store.delete('expenses', self.user_id, deleted)
+        else:
+            merged = expenses
+
+        self.save_state()
+        return merged, changed, deleted
+
+    def fetch_period_total(self, start_date):
+        """Sum and count the expenses counted against the budget since `start_date` on the server.
+
+        Returns (total, count) from a single aggregation query, so the budget summary
+        does not need the whole history. `owe status` is never True (it holds the
+        owe strings or False), which leaves "not shared, or added by this user".
+
+        Each branch of the OR pairs an equality with the `date` range, so Firestore needs the
+        composite indexes (shared, date) and (user id, date) on `expenses`, defined in
+        firestore.indexes.json (`firebase deploy --only firestore:indexes`). Without them
+        the query fails with FailedPrecondition.
+        """
+        query = (self.expenses_ref
+                 .where(filter=fire.FieldFilter('date', '>=', start_date))
+                 .where(filter=fire.Or([
+                     fire.FieldFilter('shared', '==', 'No'),
+                     fire.FieldFilter('user id', '==', self.user_id)
+                 ])))
+        values = {}
+        for result in query.sum('amount', alias='total').count(alias='count').get():
+            for aggregate in result:
+                values[aggregate.alias] = aggregate.value
+        return values.get('total') or 0, values.get('count') or 0
+
+    def tombstone_write(self, expense_id, user_id=None):
+        """Tombstone write to commit with a delete, so other sessions drop the expense on their next sync"""
+        return set_write(f"users/{user_id or self.user_id}/expense_tombstones/{expense_id}",
+                         {'deleted_at': datetime.now(), UPDATED_AT: firestore.SERVER_TIMESTAMP})
@@ -1,13 +1,44 @@
+import threading
+import time
 import flet as ft
 from firebase_admin import firestore
 from google.cloud import firestore as fire
 from theme import Themecolors
 
+# User profiles rarely change, so lookups are shared across managers for a few minutes
+PROFILE_CACHE_TTL = 300
+_profile_cache = {}  # user id -> (fetched at, profile dict or None when the user does not exist)
+FRIENDS_DIRECTORY_TTL = 120
+
+
 class FriendsManager:
     def __init__(self, user_id):
         self.user_id = user_id
         self.db = firestore.client()
 
+    def get_user_profiles(self, user_ids):
+        """Get users/{id} profiles for several users with one batched read, using the profile cache"""
+        now = time.monotonic()
+        profiles = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            cached = _profile_cache.get(user_id)
+            if cached and now - cached[0] < PROFILE_CACHE_TTL:
+                if cached[1] is not None:
+                    profiles[user_id] = cached[1]
+            else:
+                missing.append(user_id)
+
+        if missing:
+            refs = [self.db.collection('users').document(user_id) for user_id in missing]
+            for doc in self.db.get_all(refs):
+                user_data = doc.to_dict() if doc.exists else None
+                _profile_cache[doc.id] = (now, user_data)
+                if user_data is not None:
+                    profiles[doc.id] = user_data
+
+        return profiles
+
     def search_users_by_email(self, email):
         """Search for users by email address"""
         try:
@@ -68,14 +99,15 @@ class FriendsManager:
                             .where(filter=fire.FieldFilter('to', '==', self.user_id))
                             .where(filter=fire.FieldFilter('status', '==', 'pending')))
 
-            for doc in requests_ref.stream():
-                request_data = doc.to_dict()
-                # Get sender info
-                sender_doc = self.db.collection('users').document(request_data['from']).get()
-                if sender_doc.exists:
-                    sender_data = sender_doc.to_dict()
+            request_docs = [(doc.id, doc.to_dict()) for doc in requests_ref.stream()]
+            # Get sender info
+            senders = self.get_user_profiles(request_data['from'] for _, request_data in request_docs)
+
+            for request_id, request_data in request_docs:
+                sender_data = senders.get(request_data['from'])
+                if sender_data is not None:
                     incoming_requests.append({
-                        'requestId': doc.id,
+                        'requestId': request_id,
                         'from': request_data['from'],
                         'fromEmail': sender_data.get('email'),
                         'fromDisplayName': sender_data.get('displayName', 'Unknown'),
@@ -111,6 +143,7 @@ class FriendsManager:
                 }
 
                 self.db.collection('friendships').document(friendship_id).set(friendship_data)
+                FriendsDirectory.invalidate_user(self.user_id, request_data['from'])
 
                 # Update request status
                 request_ref.update({
@@ -132,36 +165,38 @@ class FriendsManager:
             return {"error": str(e)}
 
     def get_friends_list(self):
-        """Get list of current user's friends"""
+        """Get list of current user's friends, None when they could not be loaded"""
         try:
             friends = []
             friendships_ref = (self.db.collection('friendships')
                                .where(filter=fire.FieldFilter('users', 'array_contains', self.user_id))
                                .where(filter=fire.FieldFilter('status', '==', 'accepted')))
 
+            friendships = []
             for doc in friendships_ref.stream():
                 friendship_data = doc.to_dict()
-                print(f"friendship_data is {friendship_data}")
                 # Get the other user's ID
                 other_user_id = friendship_data['users'][0] if friendship_data['users'][1] == self.user_id else \
                 friendship_data['users'][1]
+                friendships.append((doc.id, other_user_id))
 
-                # Get other user's info
-                user_doc = self.db.collection('users').document(other_user_id).get()
-                if user_doc.exists:
-                    user_data = user_doc.to_dict()
-                    print(f"user data: {user_data}")
+            # Get the other users' info
+            profiles = self.get_user_profiles(other_user_id for _, other_user_id in friendships)
+
+            for friendship_id, other_user_id in friendships:
+                user_data = profiles.get(other_user_id)
+                if user_data is not None:
                     friends.append({
                         'userId': other_user_id,
                         'email': user_data.get('email'),
                         'displayName': user_data.get('displayName'),
-                        'friendshipId': doc.id
+                        'friendshipId': friendship_id
                     })
             print(f"data for friends retrieved from db: {friends}")
             return friends
         except Exception as e:
             print(f"Error getting friends: {e}")
-            return []
+            return None
 
     def are_friends(self, other_user_id):
         """Check if two users are friends"""
@@ -183,16 +218,98 @@ class FriendsManager:
         try:
             friendship_id = f"{min(self.user_id, friend_user_id)}_{max(self.user_id, friend_user_id)}"
             self.db.collection('friendships').document(friendship_id).delete()
+            FriendsDirectory.invalidate_user(self.user_id, friend_user_id)
             return {"success": True, "message": "Friend removed"}
         except Exception as e:
             return {"error": str(e)}
 
 
+class FriendsDirectory:
+    """Friends of one user, loaded once and shared by BudgetApp and FriendsUI.
+
+    The list is kept for FRIENDS_DIRECTORY_TTL seconds and dropped early when a
+    friendship is accepted or removed, so adding, editing or settling expenses
+    does not re-run the friendships query every time.
+    """
+
+    _directories = {}
+    _directories_lock = threading.Lock()
+
+    def __init__(self, user_id, ttl=FRIENDS_DIRECTORY_TTL):
+        self.user_id = user_id
+        self.ttl = ttl
+        self.friends_manager = FriendsManager(user_id)
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._friends = []
+        self._email_to_uid = {}
+        self._uid_to_name = {}
+
+    @classmethod
+    def for_user(cls, user_id):
+        """Return the directory shared by everything running for `user_id`"""
+        with cls._directories_lock:
+            directory = cls._directories.get(user_id)
+            if directory is None:
+                directory = cls(user_id)
+                cls._directories[user_id] = directory
+            return directory
+
+    @classmethod
+    def invalidate_user(cls, *user_ids):
+        for user_id in user_ids:
+            directory = cls._directories.get(user_id)
+            if directory:
+                directory.invalidate()
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return
+            friends = self.friends_manager.get_friends_list()
+            if friends is None:
+                return  # Keep what was loaded before, the next lookup tries again
+            self._friends = friends
+            self._email_to_uid = {friend['email']: friend['userId'] for friend in friends}
+            self._uid_to_name = {friend['userId']: friend['displayName'] for friend in friends}
+            self._loaded_at = time.monotonic()
+
+    @property
+    def friends(self):
+        self._ensure_loaded()
+        return self._friends
+
+    @property
+    def email_to_uid(self):
+        self._ensure_loaded()
+        return self._email_to_uid
+
+    @property
+    def uid_to_name(self):
+        self._ensure_loaded()
+        return self._uid_to_name
+
+    def user_id_for(self, email):
+        """User id of the friend with `email`, None if they are not a friend.
+
+        A miss reloads the list once, a friendship accepted on another device may not be in it yet.
+        """
+        user_id = self.email_to_uid.get(email)
+        if user_id is None:
+            self.invalidate()
+            user_id = self.email_to_uid.get(email)
+        return user_id
+
+
 class FriendsUI:
     def __init__(self, page: ft.Page, user_id):
         self.page = page
         self.user_id = user_id
-        self.friends_manager = FriendsManager(user_id)
+        self.friends_directory = FriendsDirectory.for_user(user_id)
+        self.friends_manager = self.friends_directory.friends_manager
         self.theme_colors = Themecolors(self.page)
 
         # UI Controls
@@ -469,7 +586,7 @@ class FriendsUI:
         self.requests_list.controls.clear()
 
         # Load friends
-        friends = self.friends_manager.get_friends_list()
+        friends = self.friends_directory.friends
         if friends:
             for friend in friends:
                 friend_row = ft.Row([
@@ -511,6 +628,7 @@ class FriendsUI:
 
     def refresh_clicked(self, e):
         """Refresh button clicked"""
+        self.friends_directory.invalidate()
         self.refresh_data()
         self.status_text.value = "Refreshed!"
         self.status_text.color = ft.colors.GREEN
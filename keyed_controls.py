@@ -0,0 +1,73 @@
+import flet as ft
+
+
+class KeyedControlList:
+    """Keeps the controls of a ListView or Column in step with a list of keyed items.
+
+    Every item is shown in a slot (a Container) that stays the same control for as
+    long as the item's key is listed. `reconcile` rebuilds the content of the
+    slots whose item changed and adds or removes slots only for keys that came or
+    went, then sends just that: `update()` on the changed slots, and one update of
+    the list when slots were added, removed or moved, which Flet turns into add
+    and remove commands for those slots only.
+    """
+
+    def __init__(self, list_control, build, render=None):
+        self.list_control = list_control
+        self.build = build  # item -> control
+        self.render = render  # RenderScheduler the updates are marked on, when set
+        self.slots = {}  # key -> Container
+        self.items = {}  # key -> copy of the item its slot shows
+        self.context = None  # what else the slots were built from, see reconcile
+
+    def clear(self):
+        self.slots = {}
+        self.items = {}
+        self.context = None
+
+    def reconcile(self, items, key=lambda item: item.get('id'), placeholder=None, footer=None, context=None):
+        """Show `items` in order, `placeholder` instead when there are none, and `footer` after them.
+
+        `context` is whatever else `build` reads besides the item (e.g. the currency),
+        every slot is rebuilt when it changes. Returns the number of slots whose content
+        was rebuilt.
+        """
+        if context != self.context:
+            self.items = {item_key: None for item_key in self.items}
+            self.context = context
+        slots = {}
+        patched = []
+        for item in items:
+            item_key = key(item)
+            slot = self.slots.get(item_key)
+            if slot is None:
+                slot = ft.Container(content=self.build(item))
+            elif self.items[item_key] != item:
+                slot.content = self.build(item)
+                patched.append(slot)
+            slots[item_key] = slot
+            self.items[item_key] = dict(item)
+        for item_key in self.slots.keys() - slots.keys():
+            del self.items[item_key]
+        self.slots = slots
+
+        controls = list(slots.values())
+        if not controls and placeholder is not None:
+            controls = [placeholder]
+        if footer is not None:
+            controls.append(footer)
+
+        if controls != self.list_control.controls:
+            self.list_control.controls[:] = controls
+            self._update(self.list_control)
+        else:
+            for control in patched + ([footer] if footer is not None else []):
+                self._update(control)
+        return len(patched)
+
+    def _update(self, control):
+        if self.render is not None:
+            self.render.mark(control)
+        # Nothing to send before the control is on a page, the next page update shows it
+        elif control.page:
+            control.update()
@@ -0,0 +1,217 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime
+from firebase_admin import firestore
+
+from expense_sync import timestamp_key
+
+# Journaled writes keep SERVER_TIMESTAMP so the server still fills it in when they are replayed
+SERVER_TIMESTAMP_TAG = '__server_timestamp__'
+
+
+def _encode_value(value):
+    """json.dumps hook for Firestore values that are not plain JSON"""
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    # Sentinels such as SERVER_TIMESTAMP only make sense on the way to Firestore
+    return None
+
+
+def _decode_object(obj):
+    if '__datetime__' in obj and len(obj) == 1:
+        return datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+
+def _encode_write_value(value):
+    if value is firestore.SERVER_TIMESTAMP:
+        return {SERVER_TIMESTAMP_TAG: True}
+    return _encode_value(value)
+
+
+def _decode_write_object(obj):
+    if SERVER_TIMESTAMP_TAG in obj and len(obj) == 1:
+        return firestore.SERVER_TIMESTAMP
+    return _decode_object(obj)
+
+
+def dumps(data):
+    return json.dumps(data, default=_encode_value)
+
+
+def loads(text):
+    return json.loads(text, object_hook=_decode_object)
+
+
+def dumps_writes(writes):
+    return json.dumps(writes, default=_encode_write_value)
+
+
+def loads_writes(text):
+    return json.loads(text, object_hook=_decode_write_object)
+
+
+class LocalStore:
+    """SQLite read-through cache of a user's Firestore data.
+
+    Lives next to the session file in ~/.expense_tracker so the app can paint
+    from disk on start-up and reconcile with Firestore afterwards.
+    """
+
+    COLLECTIONS = ('expenses', 'wishes', 'analyses')
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._create_schema()
+        except Exception as e:
+            print(f"❌ Error opening local store: {e}")
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.db_path, timeout=10))
+
+    def _create_schema(self):
+        with self._lock, self._connect() as conn, conn:
+            for table in self.COLLECTIONS:
+                conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        user_id TEXT NOT NULL,
+                        id TEXT NOT NULL,
+                        sort_key REAL NOT NULL,
+                        data TEXT NOT NULL,
+                        PRIMARY KEY (user_id, id)
+                    )""")
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_by_time ON {table} (user_id, sort_key)")
+            # Single documents per user: budget, settings and sync cursors
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    user_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (user_id, name)
+                )""")
+            # Groups of Firestore writes not committed yet, in the order they were made
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pending_writes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    writes TEXT NOT NULL
+                )""")
+
+    def load_collection(self, table, user_id):
+        """Return cached entries of `table`, newest first"""
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(f"SELECT data FROM {table} WHERE user_id = ? ORDER BY sort_key DESC",
+                                    (user_id,)).fetchall()
+            return [loads(row[0]) for row in rows]
+        except Exception as e:
+            print(f"❌ Error reading {table} from local store: {e}")
+            return []
+
+    def upsert(self, table, user_id, items):
+        """Insert or replace entries keyed by their 'id'"""
+        rows = [(user_id, item['id'], timestamp_key(item.get('timestamp')), dumps(item))
+                for item in items if item.get('id')]
+        if not rows:
+            return
+        try:
+            with self._lock, self._connect() as conn, conn:
+                conn.executemany(f"INSERT OR REPLACE INTO {table} (user_id, id, sort_key, data) VALUES (?, ?, ?, ?)",
+                                 rows)
+        except Exception as e:
+            print(f"❌ Error writing {table} to local store: {e}")
+
+    def delete(self, table, user_id, ids):
+        ids = [(user_id, item_id) for item_id in ids]
+        if not ids:
+            return
+        try:
+            with self._lock, self._connect() as conn, conn:
+                conn.executemany(f"DELETE FROM {table} WHERE user_id = ? AND id = ?", ids)
+        except Exception as e:
+            print(f"❌ Error deleting from {table} in local store: {e}")
+
+    def replace_collection(self, table, user_id, items):
+        """Replace every cached entry of `table` for the user"""
+        try:
+            with self._lock, self._connect() as conn, conn:
+                conn.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+                conn.executemany(f"INSERT OR REPLACE INTO {table} (user_id, id, sort_key, data) VALUES (?, ?, ?, ?)",
+                                 [(user_id, item['id'], timestamp_key(item.get('timestamp')), dumps(item))
+                                  for item in items if item.get('id')])
+        except Exception as e:
+            print(f"❌ Error replacing {table} in local store: {e}")
+
+    def get_document(self, user_id, name, default=None):
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT data FROM documents WHERE user_id = ? AND name = ?",
+                                   (user_id, name)).fetchone()
+            return loads(row[0]) if row else default
+        except Exception as e:
+            print(f"❌ Error reading {name} from local store: {e}")
+            return default
+
+    def set_document(self, user_id, name, data):
+        try:
+            with self._lock, self._connect() as conn, conn:
+                conn.execute("INSERT OR REPLACE INTO documents (user_id, name, data) VALUES (?, ?, ?)",
+                             (user_id, name, dumps(data)))
+        except Exception as e:
+            print(f"❌ Error writing {name} to local store: {e}")
+
+    def has_data(self, user_id):
+        """Whether a budget or any expense has been cached for the user yet"""
+        try:
+            with self._connect() as conn:
+                row = conn.execute("""
+                    SELECT EXISTS (SELECT 1 FROM expenses WHERE user_id = ?)
+                        OR EXISTS (SELECT 1 FROM documents WHERE user_id = ? AND name = 'budget')""",
+                                   (user_id, user_id)).fetchone()
+            return bool(row[0])
+        except Exception as e:
+            print(f"❌ Error reading local store: {e}")
+            return False
+
+    def add_pending_writes(self, writes):
+        """Journal a group of writes, returns its sequence number (None if it could not be saved)"""
+        try:
+            with self._lock, self._connect() as conn, conn:
+                return conn.execute("INSERT INTO pending_writes (writes) VALUES (?)", (dumps_writes(writes),)).lastrowid
+        except Exception as e:
+            print(f"❌ Error journaling writes: {e}")
+            return None
+
+    def load_pending_writes(self):
+        """Return [(seq, writes)] of every journaled group, oldest first"""
+        try:
+            with self._connect() as conn:
+                rows = conn.execute("SELECT seq, writes FROM pending_writes ORDER BY seq").fetchall()
+            return [(seq, loads_writes(writes)) for seq, writes in rows]
+        except Exception as e:
+            print(f"❌ Error reading pending writes: {e}")
+            return []
+
+    def remove_pending_writes(self, seqs):
+        seqs = [(seq,) for seq in seqs if seq is not None]
+        if not seqs:
+            return
+        try:
+            with self._lock, self._connect() as conn, conn:
+                conn.executemany("DELETE FROM pending_writes WHERE seq = ?", seqs)
+        except Exception as e:
+            print(f"❌ Error removing pending writes: {e}")
+
+    def clear_user(self, user_id):
+        """Forget the cached data of `user_id`, journaled writes stay so they are still sent"""
+        try:
+            with self._lock, self._connect() as conn, conn:
+                for table in self.COLLECTIONS + ('documents',):
+                    conn.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+        except Exception as e:
+            print(f"❌ Error clearing local store: {e}")
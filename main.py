@@ -2,27 +2,71 @@ import flet as ft
 import json
 from firebase_admin import firestore, auth
 from google.cloud import firestore as fire
+from google.api_core import exceptions as api_exceptions
 from datetime import datetime, timedelta, time
 from typing import Dict
 import os
 from dotenv import load_dotenv
 import random
 import base64
+import functools
+import threading
 from dateutil.relativedelta import relativedelta
 from theme import Themecolors
 from auth_manager import AuthManager
-from friends_manager import FriendsUI, FriendsManager
+from friends_manager import FriendsUI, FriendsDirectory
+from keyed_controls import KeyedControlList
 from ai_utilities import FinancialAdviceGenerator
 from claude_api import ClaudeUtilityFunctions
 from firebase_utils import FirebaseAuth
+from expense_sync import ExpenseSyncEngine, expense_write, timestamp_key
+from date_index import DateIndex
+from balance_ledger import BalanceLedger
+from budget_metrics import BudgetMetrics
+from categories import CATEGORIES, category_color, category_dropdown_options, category_icon
+from expense_ledger import ExpenseLedger
+from expense_records import ExpenseRecord, build_records, epoch_seconds
+from local_store import LocalStore
+from startup_loader import StartupLoader
+from realtime_sync import RealtimeSync
+from render_scheduler import RenderScheduler, in_render_batch
+from write_queue import WriteBehindQueue, new_document_id, set_write, delete_write
+
+# How far back the period filters of the expenses, wish list and charts tabs reach
+PERIOD_DAYS = {"1M": 30, "2M": 60, "3M": 90, "6M": 180, "12M": 365}
+# Categories and single expenses listed in the Top Categories card
+HIGHEST_EXPENSES_SHOWN = 3
+# Expense cards materialized per page of the expenses list, more are added while scrolling
+EXPENSE_PAGE_SIZE = 25
+# How close to the end of the expenses list (in pixels) scrolling loads the next page
+EXPENSE_LIST_LOAD_AHEAD = 600
 
 load_dotenv()
 
+# All user settings live in users/{uid}/settings/profile
+SETTINGS_DOCUMENT = 'profile'
+# Per-field settings documents used before the single settings document: doc id -> field
+LEGACY_SETTINGS_FIELDS = {
+    'display_name': 'display_name',
+    'avatar': 'avatar_path',
+    'theme': 'theme'
+}
+
+
+def holding_data_lock(method):
+    """Run a BudgetApp method while it holds the data lock"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.data_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
 class BudgetApp:
     def __init__(self, page: ft.Page):
         # Check if configuration is loaded
         self.page = page
+        # Collects what event handlers changed and sends it in one update
+        self.render = RenderScheduler(page)
         self.page.title = "Expense Tracker"
         self.page.theme_mode = ft.ThemeMode.DARK
         self.is_dark_mode = True
@@ -31,23 +75,31 @@ class BudgetApp:
         self.page.horizontal_alignment = ft.CrossAxisAlignment.CENTER
         self.db = None
 
-        self.budget_amount = 0
-        self.start_date = datetime.now().strftime('%Y-%m-%d')
-        self.end_date = datetime.now().strftime('%Y-%m-%d')
-        self.expenses = []
-        self.wishes = []
-        self.analysis = []
+        self.init_data_state()
+        # One snackbar in the overlay, show_snackbar changes its text and opens it again
+        self.snackbar = ft.SnackBar(content=ft.Text())
+        self.page.overlay.append(self.snackbar)
         self.expense_form_dialog = None
         self.income_form_dialog = None
         self.wish_list_form_dialog = None
         self.edit_expense_dialog = None
         self.editing_expense_id = None
-        self.recurring_expenses = []
-        self.recurring_expense_timestamps = []
         self.uploaded_image = None
         self.processed_expense_data = None
         self.file_picker = None
         self.recurring_only = False
+        self.local_store = None
+        self.reconcile_lock = threading.Lock()
+        self.startup_loader = StartupLoader()
+        self.realtime_sync = None
+        self.write_queue = None
+        self.friends_ui = None
+        self.expenses_tab = None  # The tabs after the overview are built on first selection
+        self.wish_list_tab = None
+        self.expense_list_view = None
+        self.wish_list_view = None
+        self.filtered_expenses = []
+        self.expense_list_limit = EXPENSE_PAGE_SIZE
 
         # Firebase configuration
         self.API_KEY = os.getenv('FIREBASE_API_KEY')
@@ -87,6 +139,10 @@ class BudgetApp:
         )
 
         self.auth_manager = AuthManager()
+        self.local_store = LocalStore(os.path.join(os.path.dirname(self.auth_manager.user_data_file),
+                                                   'expense_cache.db'))
+        # Journaled writes of earlier sessions are replayed once a Firestore client is attached
+        self.write_queue = WriteBehindQueue(store=self.local_store)
         self.advice_generator = FinancialAdviceGenerator()
         self.initialize_firebase()
         self.ai_analyst = ClaudeUtilityFunctions()
@@ -94,6 +150,31 @@ class BudgetApp:
         self.check_existing_session()
         # self.setup_ui()
 
+    def init_data_state(self):
+        """The expense, wish and budget data and the structures derived from it, without any UI or Firebase"""
+        self.budget_amount = 0
+        self.start_date = datetime.now().strftime('%Y-%m-%d')
+        self.end_date = datetime.now().strftime('%Y-%m-%d')
+        self.expenses = []
+        self.wishes = []
+        self.analysis = []
+        self.recurring_expenses = []
+        self.recurring_expense_timestamps = []
+        self.expense_sync = None
+        self.expenses_loaded = False
+        self.period_total = None  # (start_date, total, count) aggregated by Firestore
+        self.expense_ledger = ExpenseLedger(categories=CATEGORIES)
+        self.budget_metrics = BudgetMetrics(self.expense_ledger)
+        self.balance_ledger = BalanceLedger()
+        self.expense_records = {}  # expense id -> ExpenseRecord, of the recurring expenses only
+        self.expenses_by_id = {}
+        self.wishes_by_id = {}
+        self.wish_index = DateIndex()
+        # Guards self.expenses, self.wishes and everything derived from them (records, ledgers,
+        # indexes, sync cursors). Flet handlers, the snapshot listeners and the reconcile thread
+        # all change them, so every read-modify-write and every render of them holds it.
+        self.data_lock = threading.RLock()
+
     def set_app_theme(self, e=None):
         self.is_dark_mode = e.control.value
         self.update_user_profile(self.user_id, "theme", self.is_dark_mode)
@@ -104,8 +185,26 @@ class BudgetApp:
         else:
             self.page.theme_mode = ft.ThemeMode.LIGHT
 
-        self.page.update()
-        self.show_main()
+        # Only the colors change, the views and their data stay as they are
+        if not self.theme_color.recolor():
+            self.rebuild_tabs()
+            self.build_tab(self.tabs.selected_index)
+        self.render.mark()
+
+    @holding_data_lock
+    def rebuild_tabs(self):
+        """Build the overview again and drop the other tabs, they are built again when next selected"""
+        self.tabs.indicator_color = self.theme_color.teal_text_secondary
+        self.tabs.label_color = self.theme_color.teal_text_secondary
+        self.tabs.unselected_label_color = self.theme_color.text_secondary
+        self.overview_tab = self.create_overview_tab()
+        self.tabs.tabs[0].content = self.overview_tab
+        for index, (attribute, _, _, _) in self.lazy_tabs.items():
+            setattr(self, attribute, None)
+            self.tabs.tabs[index].content = None
+        # The list cards were built in the old colors
+        self.expense_list_view.clear()
+        self.wish_list_view.clear()
 
     def check_existing_session(self):
         user_session = self.auth_manager.load_user_session()
@@ -413,7 +512,7 @@ class BudgetApp:
         else:
             password_field.password = True
             e.control.icon = ft.icons.VISIBILITY_OFF
-        self.page.update()
+        self.render.mark()
 
     def biometric_login(self, e):
         """Handle biometric authentication (if available)"""
@@ -425,16 +524,14 @@ class BudgetApp:
         """Display status messages to user"""
         self.status_text.value = message
         self.status_text.color = ft.colors.RED_400 if is_error else ft.colors.GREEN_400
-        self.page.update()
+        self.render.mark()
 
         # Auto-clear message after 3 seconds
-        import threading
-
         def clear_message():
             import time
             time.sleep(3)
             self.status_text.value = ""
-            self.page.update()
+            self.render.mark()
 
         threading.Thread(target=clear_message, daemon=True).start()
 
@@ -499,12 +596,17 @@ class BudgetApp:
 
     def update_user_profile(self, user_id, field, value):
         try:
-            self.db.collection('users').document(user_id).collection('settings').document(field).set({
-                field: value
-            }, merge=True)
+            self.write_queue.enqueue([
+                set_write(self.user_path('settings', SETTINGS_DOCUMENT, user_id), {field: value}, merge=True)
+            ])
+            self.local_store.set_document(user_id, 'settings', self.settings_document())
         except Exception as e:
             print(f"Error updating {field}: {e}")
 
+    def user_path(self, collection, document_id, user_id=None):
+        """Firestore path of users/{uid}/{collection}/{document_id}"""
+        return f"users/{user_id or self.user_id}/{collection}/{document_id}"
+
     def sign_up_clicked(self, email, password, e=None):
         """Handle sign up button click"""
         email = self.email_field.value
@@ -555,17 +657,31 @@ class BudgetApp:
         self.error_text.value = ""
 
         self.auth_manager.clear_user_session()
+        self.stop_realtime_sync()
+
+        # The next person on this device must not inherit the cached history
+        with self.data_lock:
+            if self.local_store and self.user_id:
+                self.local_store.clear_user(self.user_id)
+            self.expense_sync = None
+            self.expenses = []
+            self.wishes = []
+            self.analysis = []
+            self.recurring_expenses = []
+            self.recurring_expense_timestamps = []
+            self.on_expenses_reloaded()
+            self.on_wishes_reloaded()
 
         # Reset to auth view
         self.page.clean()
         auth_view = self.create_auth_view()
         self.page.add(auth_view)
-        self.page.update()
+        self.render.mark()
 
     def show_error(self, message):
         """Display error message"""
         self.error_text.value = message
-        self.page.update()
+        self.render.mark()
 
     def initialize_firebase(self):
         """Initialize Firebase only when needed"""
@@ -589,32 +705,42 @@ class BudgetApp:
             # Add the authentication view
             auth_view = self.create_auth_view()
             self.page.add(auth_view)
-            self.page.update()
+            self.render.mark()
 
 
         except Exception as e:
             print(f"Error setting up UI: {e}")
             # Add a simple fallback UI
             self.page.add(ft.Text("Error loading app"))
-            self.page.update()
+            self.render.mark()
 
     def show_main(self):
         self.page.clean()
 
-        self.expenses_list = ft.ListView(spacing=10, padding=20, auto_scroll=False, height=500)
-        self.wish_list = ft.ListView(spacing=10, padding=20, auto_scroll=False, height=300)
-        self.analysis_list = ft.ListView(spacing=10, padding=20, auto_scroll=False, height=300)
+        self.create_list_views()
 
         self.recurring_checkbox = ft.Checkbox(label="Recurring expenses", on_change=self.update_expenses_list)
         self.filter_category_options = [ft.dropdown.Option("All")]
         self.filter_category_options += self.show_expense_category()
 
-        # Load initial data
-        self.load_budget_data()
-        self.load_expenses()
-        self.load_wish_list()
-        self.load_analysis_list()
-        self.load_settings()
+        if not self.db:
+            self.db = firestore.client()
+
+        self.write_queue.attach(self.db)
+        if self.realtime_sync and self.realtime_sync.user_id != self.user_id:
+            self.stop_realtime_sync()
+
+        # Paint from the local cache (or what is already in memory) and reconcile with Firestore afterwards
+        if self.expense_sync is None or self.expense_sync.user_id != self.user_id:
+            has_local_data = self.load_cached_data()
+        else:
+            has_local_data = True
+        just_loaded = ()
+        if not has_local_data:
+            # First start on this device: the overview only needs the budget, the settings and the
+            # period total, the expense history is loaded in the background below
+            just_loaded = self.load_overview_data()
+
         if self.is_dark_mode:
             self.page.theme_mode = ft.ThemeMode.DARK
         else:
@@ -622,13 +748,18 @@ class BudgetApp:
 
 
 
-        friends_ui = FriendsUI(self.page, self.user_id)
-
-        # Create tabs
+        # Only the overview is built before the first frame, the other tabs when they are first selected
+        self.friends_ui = None
+        self.expenses_tab = None
+        self.wish_list_tab = None
+        self.friends_tab = None
+        # index -> (attribute, load, create, refresh), `load` fetches what `create` shows
+        self.lazy_tabs = {
+            1: ('expenses_tab', None, self.create_expenses_tab, self.update_displays),
+            2: ('wish_list_tab', None, self.create_wish_list_tab, self.update_wish_list),
+            3: ('friends_tab', self.load_friends_tab, self.create_friends_tab, None),
+        }
         self.overview_tab = self.create_overview_tab()
-        self.expenses_tab = self.create_expenses_tab()
-        self.charts_tab = self.create_charts_tab()
-        self.wish_list_tab = self.create_wish_list_tab()
 
         self.tabs = ft.Tabs(
             selected_index=0,
@@ -636,26 +767,261 @@ class BudgetApp:
             label_color=self.theme_color.teal_text_secondary,
             unselected_label_color=self.theme_color.text_secondary,
             animation_duration=300,
+            on_change=self.on_tab_change,
             tabs=[
                 ft.Tab(
                     text="Overview",
                     content=self.overview_tab,
                 ),
-                ft.Tab(
-                    text="Expenses",
-                    content=self.expenses_tab
-                ),
-                ft.Tab(
-                    text="My Wish List",
-                    content=self.wish_list_tab
-                ),
-                ft.Tab(text="Friends", content=friends_ui.create_friends_view())
+                ft.Tab(text="Expenses"),
+                ft.Tab(text="My Wish List"),
+                ft.Tab(text="Friends")
             ],
             expand=True
         )
 
         self.page.add(self.tabs)
 
+        if has_local_data:
+            self.start_realtime_sync()
+        threading.Thread(target=self.reconcile_with_firestore, args=(just_loaded,), daemon=True).start()
+
+    def create_list_views(self):
+        """The expense, wish and analysis lists the update_*_list methods fill"""
+        self.expenses_list = ft.ListView(spacing=10, padding=20, auto_scroll=False, height=500,
+                                         on_scroll=self.on_expenses_list_scroll, on_scroll_interval=100)
+        self.filtered_expenses = []
+        self.expense_list_limit = EXPENSE_PAGE_SIZE
+        self.expense_list_view = KeyedControlList(self.expenses_list, self.create_expense_item, self.render)
+        self.expense_list_more_button = ft.TextButton(on_click=self.load_more_expenses)
+        self.wish_list = ft.ListView(spacing=10, padding=20, auto_scroll=False, height=300)
+        self.wish_list_view = KeyedControlList(self.wish_list, self.create_wish_item, self.render)
+        self.analysis_list = ft.ListView(spacing=10, padding=20, auto_scroll=False, height=300)
+
+    def on_tab_change(self, e):
+        self.build_tab(self.tabs.selected_index)
+
+    def build_tab(self, index):
+        """Build a tab the first time it is selected, later selections show the same controls.
+
+        The tab's Firestore reads run before the data lock is taken, so the listeners and the
+        reconcile are not held up by them, only building the controls holds it.
+        """
+        if index not in self.lazy_tabs:
+            return
+        attribute, load, create, refresh = self.lazy_tabs[index]
+        if getattr(self, attribute) is not None:
+            return
+        if load:
+            load()
+        with self.render.batch(), self.data_lock:
+            if getattr(self, attribute) is not None:
+                return  # Built by another handler meanwhile
+            setattr(self, attribute, create())
+            self.tabs.tabs[index].content = getattr(self, attribute)
+            if refresh:
+                refresh()
+            self.render.mark(self.tabs)
+
+    def load_friends_tab(self):
+        # FriendsUI loads the friends and the friend requests from Firestore
+        self.friends_ui = FriendsUI(self.page, self.user_id)
+
+    def create_friends_tab(self):
+        return self.friends_ui.create_friends_view()
+
+    def load_overview_data(self):
+        """Load the budget and settings concurrently, then the current period total.
+
+        Returns the names of the loaded tasks, the reconcile that follows skips them.
+        """
+        if not self.db:
+            self.db = firestore.client()
+
+        tasks = {
+            'budget': self.load_budget_data,
+            'settings': self.load_settings,
+        }
+        self.startup_loader.run(tasks)
+        self.load_period_total()
+        return tuple(tasks)
+
+    def load_period_total(self):
+        """Aggregate the current period total on the server, get_total_expenses uses it until expenses load"""
+        try:
+            total, count = ExpenseSyncEngine(self.db, self.user_id).fetch_period_total(self.start_date)
+            self.period_total = (self.start_date, total, count)
+            print(f"✅ Period total from Firebase: {total:.2f} over {count} expenses")
+        except api_exceptions.FailedPrecondition as e:
+            print("❌ Period total needs the composite indexes in firestore.indexes.json, "
+                  f"deploy them with `firebase deploy --only firestore:indexes`. Using loaded expenses: {e}")
+        except Exception as e:
+            print(f"❌ Error aggregating period total, using loaded expenses: {e}")
+
+    @holding_data_lock
+    def on_startup_task_done(self, name):
+        """Refresh the budget summary as soon as its data is in, without waiting for the other loaders"""
+        if name in ('budget', 'expenses') and hasattr(self, 'budget_summary'):
+            self.update_budget_summary()
+            self.create_budget_progress_card()
+            self.render.mark()
+
+    def load_firestore_data(self, on_task_done=None, skip=()):
+        """Load budget, expenses, wishes, analyses and settings from Firebase concurrently, except `skip`"""
+        if not self.db:
+            self.db = firestore.client()
+
+        tasks = {
+            'budget': self.load_budget_data,
+            'expenses': self.load_expenses,
+            'wishes': self.load_wish_list,
+            'analyses': self.load_analysis_list,
+            'settings': self.load_settings,
+        }
+        if self.realtime_sync and self.realtime_sync.active:
+            # The snapshot listeners already deliver expense and wish list changes
+            del tasks['expenses'], tasks['wishes']
+        for name in skip:
+            tasks.pop(name, None)
+        self.startup_loader.run(tasks, on_task_done)
+        # Firestore may be reachable again, replay journaled writes without waiting for the backoff
+        self.write_queue.retry_now()
+
+        # Recurring entries are due relative to the loaded budget period, so wait for all loaders
+        self.automaticaly_update_expense()
+
+    @holding_data_lock
+    def load_cached_data(self):
+        """Load the user's data from the local store, returns False if nothing is cached yet"""
+        self.expenses_loaded = False
+        self.period_total = None
+        if not self.local_store or not self.local_store.has_data(self.user_id):
+            # Nothing of a previously signed in user may stay on screen
+            self.expenses = []
+            self.wishes = []
+            self.analysis = []
+            self.recurring_expenses = []
+            self.recurring_expense_timestamps = []
+            self.on_expenses_reloaded()
+            self.on_wishes_reloaded()
+            return False
+
+        budget_data = self.local_store.get_document(self.user_id, 'budget')
+        if budget_data:
+            self.apply_budget_data(budget_data)
+        settings_data = self.local_store.get_document(self.user_id, 'settings')
+        if settings_data:
+            self.apply_settings_data(settings_data)
+
+        self.wishes = self.local_store.load_collection('wishes', self.user_id)
+        self.on_wishes_reloaded()
+        self.analysis = self.local_store.load_collection('analyses', self.user_id)
+
+        self.expense_sync = ExpenseSyncEngine(self.db, self.user_id, self.local_store)
+        self.expenses = self.local_store.load_collection('expenses', self.user_id)
+        self.on_expenses_reloaded()
+        self.recurring_expenses = []
+        self.recurring_expense_timestamps = []
+        self.refresh_recurring_expenses(self.expenses)
+        self.expenses_loaded = True
+        print(f"✅ Loaded {len(self.expenses)} expenses from local store")
+        return True
+
+    def reconcile_with_firestore(self, just_loaded=()):
+        """Bring the cached data up to date with Firebase and refresh the views (runs off the UI thread).
+
+        `just_loaded` names the startup tasks already fetched for this screen, they are not fetched again.
+        """
+        if not self.reconcile_lock.acquire(blocking=False):
+            return
+        try:
+            self.load_firestore_data(on_task_done=self.on_startup_task_done, skip=just_loaded)
+            self.refresh_data_views()
+            self.start_realtime_sync()
+        except Exception as e:
+            print(f"❌ Error reconciling with Firebase: {e}")
+        finally:
+            self.reconcile_lock.release()
+
+    def start_realtime_sync(self):
+        """Listen for expense, wish list and friend request changes of the current user"""
+        if self.realtime_sync and self.realtime_sync.active:
+            return
+        if self.expense_sync is None or self.expense_sync.user_id != self.user_id:
+            self.expense_sync = ExpenseSyncEngine(self.db, self.user_id, self.local_store)
+
+        self.realtime_sync = RealtimeSync(self.db, self.user_id,
+                                          on_expenses=self.on_expenses_snapshot,
+                                          on_wishes=self.on_wishes_snapshot,
+                                          on_friend_requests=self.on_friend_requests_snapshot)
+        self.realtime_sync.start(self.expense_sync.cursor, self.expense_sync.tombstone_cursor)
+
+    def stop_realtime_sync(self):
+        if self.realtime_sync:
+            self.realtime_sync.stop()
+            self.realtime_sync = None
+
+    @in_render_batch
+    @holding_data_lock
+    def on_expenses_snapshot(self, changed, deleted, deleted_at):
+        """Apply an expenses/tombstones snapshot delta and re-render the affected cards"""
+        self.expense_sync.advance_cursors(changed, deleted_at)
+        self.expenses, changed, deleted = self.expense_sync.apply(self.expenses, changed, deleted)
+        if not changed and not deleted:
+            return
+        self.on_expenses_changed(changed, deleted)
+        print(f"🔄 Expenses snapshot: {len(changed)} changed, {len(deleted)} deleted")
+        self.refresh_recurring_expenses(changed, deleted)
+
+        if hasattr(self, 'expenses_list'):
+            self.update_expenses_list()
+            self.update_budget_summary()
+            self.create_budget_progress_card()
+            self.create_quick_insights_row()
+            self.create_highest_expenses_card()
+            self.create_upcoming_transactions_card()
+
+    @in_render_batch
+    @holding_data_lock
+    def on_wishes_snapshot(self, changed, deleted):
+        """Apply a wish list snapshot delta and re-render the affected cards"""
+        current = {wish.get('id'): wish for wish in self.wishes}
+        changed = [wish for wish in changed if current.get(wish['id']) != wish]
+        deleted = [wish_id for wish_id in deleted if wish_id in current]
+        if not changed and not deleted:
+            return
+
+        for wish_id in deleted:
+            current.pop(wish_id)
+        for wish in changed:
+            current[wish['id']] = wish
+        self.wishes = sorted(current.values(), key=lambda wish: timestamp_key(wish.get('timestamp')), reverse=True)
+        self.on_wishes_changed(changed, deleted)
+        self.local_store.upsert('wishes', self.user_id, changed)
+        self.local_store.delete('wishes', self.user_id, deleted)
+        print(f"🔄 Wish list snapshot: {len(changed)} changed, {len(deleted)} deleted")
+
+        if hasattr(self, 'wish_list'):
+            self.update_wish_list()
+
+    def on_friend_requests_snapshot(self):
+        if self.friends_ui:
+            self.friends_ui.refresh_data()
+            self.render.mark()
+
+    @in_render_batch
+    @holding_data_lock
+    def refresh_data_views(self):
+        """Re-render every view that shows loaded data"""
+        self.update_budget_summary()
+        self.create_budget_progress_card()
+        self.create_quick_insights_row()
+        self.create_highest_expenses_card()
+        self.create_upcoming_transactions_card()
+        self.update_expenses_list()
+        self.update_wish_list()
+        self.update_analysis_list()
+
     def test_firebase_connection(self):
         """Test Firebase connection and display current data"""
         if not self.db:
@@ -841,14 +1207,15 @@ class BudgetApp:
         )
 
     def create_header_section(self):
+        self.display_name_text = ft.Text(f"{self.current_user['displayName']}", size=18,
+                                         weight=ft.FontWeight.BOLD, color=self.theme_color.text_primary)
         return ft.Container(
             content=ft.Row([
                 ft.Row([
                     self.main_avatar_container,
                     ft.Column([
                         ft.Text(f"Welcome back!", size=14, color=self.theme_color.text_primary),
-                        ft.Text(f"{self.current_user['displayName']}", size=18, weight=ft.FontWeight.BOLD,
-                                color=self.theme_color.text_primary),
+                        self.display_name_text,
                     ], spacing=0),
                 ], spacing=12),
                 ft.Row([
@@ -860,8 +1227,8 @@ class BudgetApp:
 
     def create_budget_progress_card(self):
         budget_amount = self.budget_amount
-        total_expenses = self.get_total_expenses()
-        budget_used_percent = (total_expenses / budget_amount) * 100 if budget_amount > 0 else 0
+        metrics = self.get_budget_metrics()
+        budget_used_percent = metrics.used_percent
 
         # Choose color based on usage
         if budget_used_percent < 50:
@@ -875,8 +1242,8 @@ class BudgetApp:
             bg_color = ft.colors.RED_50
 
         # Calculate daily average and days remaining
-        daily_average = self.get_daily_average_spending()
-        days_remaining = self.get_days_remaining_in_budget_period()
+        daily_average = metrics.daily_average
+        days_remaining = metrics.days_remaining
 
         self.budget_progress_card.content = ft.Container(
             content=ft.Column([
@@ -946,8 +1313,7 @@ class BudgetApp:
             border=ft.border.all(1, ft.colors.TEAL_300)
         )
 
-        if self.page:
-            self.page.update()
+        self.render.mark(self.budget_progress_card)
 
     def create_quick_insights_row(self):
         #owed_amount = self.get_owed_amount()
@@ -1013,8 +1379,7 @@ class BudgetApp:
             ),
         ], spacing=15)
 
-        if self.page:
-            self.page.update()
+        self.render.mark(self.quick_insights_row)
 
 
     def create_highest_expenses_card(self):
@@ -1049,12 +1414,16 @@ class BudgetApp:
                 ),
             border=ft.border.all(1, ft.colors.PURPLE_300)
             )
-        if self.page:
-            self.page.update()
+        self.render.mark(self.highest_expenses_card)
 
     def create_upcoming_transactions_card(self):
-        recurring_this_week = [expense for expense in self.recurring_expenses if
-                               self.start_date < expense.get('recurring day') < self.end_date]
+        start_day = ExpenseLedger.day_of(self.start_date)
+        end_day = ExpenseLedger.day_of(self.end_date)
+        recurring_this_week = []
+        for expense in self.recurring_expenses:
+            due_date = self.get_expense_record(expense).recurring_day
+            if due_date and start_day <= ExpenseLedger.day_of(due_date) < end_day:
+                recurring_this_week.append(expense)
         amount =0
         transaction_rows = []
         for transaction in recurring_this_week:
@@ -1136,8 +1505,7 @@ class BudgetApp:
                 offset=ft.Offset(0, 2)
             )
         )
-        if self.page:
-            self.page.update()
+        self.render.mark(self.upcoming_transactions)
 
     def create_quote_section(self):
         return ft.Container(
@@ -1177,80 +1545,17 @@ class BudgetApp:
 
     def get_daily_average_spending(self):
         # Calculate based on total expenses and days in current period
-        total_expenses = self.get_total_expenses()
-        days_elapsed = self.get_days_elapsed_in_budget_period()
-        return total_expenses / days_elapsed if days_elapsed > 0 else 0
+        return self.get_budget_metrics().daily_average
 
     def get_days_remaining_in_budget_period(self):
-        end_datetime = datetime.strptime(self.end_date, "%Y-%m-%d").date()  # Remove timezone info if present
-        current_datetime = datetime.now().date()
-
-        # Calculate the difference
-        date_difference = end_datetime - current_datetime
-
-        # Get the number of days
-        days_between = date_difference.days
-        # Calculate remaining days in budget period
-        return days_between
+        return self.get_budget_metrics().days_remaining
 
     def get_days_elapsed_in_budget_period(self):
-        # Calculate elapsed days in budget period
-        start_datetime = datetime.strptime(self.start_date, "%Y-%m-%d").date()  # Remove timezone info if present
-        current_datetime = datetime.now().date()
-
-        # Calculate the difference
-        date_difference = current_datetime - start_datetime
-
-        # Get the number of days
-        days_between = date_difference.days
-
-        return days_between
+        return self.get_budget_metrics().days_elapsed
 
     def get_weekly_spending_change(self):
-        # Compare this week vs last week spending
-        # Get current date and calculate week boundaries
-        today = datetime.now()
-
-        # Get start of current week (Monday)
-        days_since_monday = today.weekday()
-        this_week_start = today - timedelta(days=days_since_monday)
-        this_week_start = this_week_start.replace(hour=0, minute=0, second=0, microsecond=0)
-
-        # Get start of last week
-        last_week_start = this_week_start - timedelta(days=7)
-        last_week_end = this_week_start
-
-        this_week_total = 0
-        last_week_total = 0
-
-        for expense in self.expenses:
-            # Convert date to datetime if it's a string
-            if isinstance(expense['date'], str):
-                expense_date = datetime.strptime(expense['date'], '%Y-%m-%d %H:%M:%S')
-            else:
-                expense_date = expense['date']
-
-            # Remove time component for comparison
-            expense_date = expense_date.replace(hour=0, minute=0, second=0, microsecond=0)
-
-            # Check if expense is in current week
-            if this_week_start <= expense_date <= today:
-                this_week_total += expense['amount']
-
-            # Check if expense is in previous week
-            elif last_week_start <= expense_date < last_week_end:
-                last_week_total += expense['amount']
-
-        # Calculate difference and percentage change
-        difference = this_week_total - last_week_total
-
-        if last_week_total == 0:
-            percentage_change = 100 if this_week_total > 0 else 0
-        else:
-            percentage_change = (difference / last_week_total) * 100
-
-
-        return difference
+        # Compare this week (from Monday) vs last week spending
+        return self.get_budget_metrics().weekly_change
 
     def get_recent_transactions(self, limit=4):
         return self.expenses[:limit]
@@ -1259,7 +1564,8 @@ class BudgetApp:
         """Navigate to Expenses tab when View All is clicked"""
         if self.tabs:
             self.tabs.selected_index = 1  # Index 1 = Expenses tab
-            self.page.update()
+            self.build_tab(1)
+            self.render.mark()
 
 
     def create_expenses_tab(self):
@@ -1370,7 +1676,7 @@ class BudgetApp:
                 # Add the new content
             self.tab_content.controls.append(content)
             self.tab_content.update()
-            self.page.update()  # Change this line
+            self.render.mark()  # Change this line
 
         expense_tab_selector = ft.Tabs(is_secondary=True, selected_index=0,
                                 on_change=create_selected_expense_tab,
@@ -1394,8 +1700,6 @@ class BudgetApp:
 
         self.page.overlay.append(self.recurring_date_picker)
 
-        self.update_displays()
-
         def create_expenses_list_tab():
             return ft.Container(
                 content=ft.Column([
@@ -1541,7 +1845,7 @@ class BudgetApp:
             self.analysis_status_text.value = ""
 
         if hasattr(self, 'page'):
-            self.page.update()
+            self.render.mark()
 
     def create_wish_list_tab(self):
         period_options = ["1M", "2M", "3M", "6M", "12M", "All"]
@@ -1561,8 +1865,6 @@ class BudgetApp:
             on_change=self.update_wish_list
         )
 
-        self.update_wish_list()
-
         return ft.Container(
             content=ft.Column([
                 # Header section with greeting and tip
@@ -1621,121 +1923,25 @@ class BudgetApp:
             bgcolor=self.theme_color.background
         )
 
-    def get_category_colors(self):
-        category_colors = {
-            # Essential Living - Warm, earthy tones (importance)
-            "Groceries": ft.colors.GREEN_400,
-            "Housing": ft.colors.BLUE_400,
-            "Utilities": ft.colors.ORANGE_600,
-            "Transportation": ft.colors.TEAL_600,
-            "Insurance": ft.colors.BLUE_GREY_600,
-            "Healthcare": ft.colors.LIGHT_GREEN_800,
-            # Personal Care - Soft, nurturing colors
-            "Personal Care": ft.colors.PINK_300,
-            "Clothing": ft.colors.PURPLE_300,
-            "Fitness": ft.colors.DEEP_PURPLE_400,
-            # Food & Dining - Warm, appetizing colors
-            "Dining Out": ft.colors.ORANGE_300,
-            "Coffee": ft.colors.BROWN_300,
-            "Snacks": ft.colors.YELLOW_600,
-
-            # Entertainment & Leisure - Vibrant, fun colors
-            "Entertainment": ft.colors.DEEP_ORANGE_ACCENT_400,
-            "Hobbies": ft.colors.INDIGO_300,
-            "Books": ft.colors.BLUE_GREY_400,
-            "Gaming": ft.colors.DEEP_PURPLE_400,
-            # Technology - Cool, modern colors
-            "Digital Services": ft.colors.BLUE_500,
-            "Electronics": ft.colors.CYAN_500,
-            "Software": ft.colors.LIGHT_BLUE_500,
-
-            # Family & Social - Warm, caring colors
-            "Childcare": ft.colors.YELLOW_400,
-            "Education": ft.colors.LIGHT_GREEN_500,
-            "Gifts": ft.colors.PINK_400,
-            "Pet Care": ft.colors.BROWN_200,
-
-            # Special Occasions - Bright, celebratory colors
-            "Travel": ft.colors.TEAL_400,
-            "Events": ft.colors.DEEP_ORANGE_300,
-            "Charity": ft.colors.LIGHT_GREEN_400,
-
-            # Financial - Professional, trustworthy colors
-            "Savings": ft.colors.GREEN_500,
-            "Investments": ft.colors.GREEN_700,
-            "Debt Payment": ft.colors.RED_500,
-
-            # Miscellaneous - Neutral colors
-            "Emergency": ft.colors.RED_600,
-            "Other": ft.colors.GREY_500,
-        }
-        return category_colors
-
-    def get_reference_date(self, period):
-        reference_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        if period == "1M":
-            reference_date = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d %H:%M:%S")
-        elif period == "2M":
-            reference_date = (datetime.now() - timedelta(days=60)).strftime("%Y-%m-%d %H:%M:%S")
-        elif period == "3M":
-            reference_date = (datetime.now() - timedelta(days=90)).strftime("%Y-%m-%d %H:%M:%S")
-        elif period == "6M":
-            reference_date = (datetime.now() - timedelta(days=180)).strftime("%Y-%m-%d %H:%M:%S")
-        elif period == "12M":
-            reference_date = (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d %H:%M:%S")
-        else:
-            reference_date = (datetime.now() - timedelta(days=1000)).strftime("%Y-%m-%d %H:%M:%S")
+    def get_category_color(self, category, default=ft.colors.GREY_500):
+        """Color of a category from the registry, `default` for unknown ones"""
+        return category_color(category, default)
 
-        return reference_date
+    def get_reference_period(self, period):
+        """How far back a chart period reaches"""
+        return timedelta(days=PERIOD_DAYS.get(period, 1000))
 
-    def get_expenses_selected_by_date(self, period):
-        expense_categories = {}
-        reference_date = self.get_reference_date(period)
+    def get_reference_day(self, period):
+        return ExpenseLedger.day_of((datetime.now() - self.get_reference_period(period)).date())
 
-        for expense in self.expenses:
-            if expense['date'] > reference_date:
-                if expense['category'] in expense_categories:
-                    expense_categories[expense['category']] += expense['amount']
-                else:
-                    expense_categories[expense['category']] = expense['amount']
-        return expense_categories
+    def get_expenses_selected_by_date(self, period):
+        return self.expense_ledger.totals_by_category(since_day=self.get_reference_day(period))
 
     def get_expenses_by_date_and_category(self, period):
         """Get expenses grouped by date and category for line chart"""
-        reference_date = datetime.strptime(self.get_reference_date(period), "%Y-%m-%d %H:%M:%S")
-
-        # Dictionary to store expenses by category and date
-        expenses_by_category_date = {}
-        all_dates = set()
-
-        for expense in self.expenses:
-            expense_date = datetime.strptime(expense['date'], "%Y-%m-%d %H:%M:%S")
-            if expense_date > reference_date:
-                date_key = expense_date.strftime("%Y-%m-%d")
-                category = expense['category']
-                amount = expense['amount']
-
-                all_dates.add(date_key)
-
-                if category not in expenses_by_category_date:
-                    expenses_by_category_date[category] = {}
-
-                if date_key in expenses_by_category_date[category]:
-                    expenses_by_category_date[category][date_key] += amount
-                else:
-                    expenses_by_category_date[category][date_key] = amount
-
-        # Sort dates
-        sorted_dates = sorted(list(all_dates))
-
-        # Fill missing dates with 0 for each category
-        for category in expenses_by_category_date:
-            for date in sorted_dates:
-                if date not in expenses_by_category_date[category]:
-                    expenses_by_category_date[category][date] = 0
-
-        return expenses_by_category_date, sorted_dates
+        return self.expense_ledger.totals_by_day_and_category(since_day=self.get_reference_day(period))
 
+    @holding_data_lock
     def update_chart_view(self, e=None):
         chart_filter = self.charts_filter.value
         period = self.charts_period_filter.value
@@ -1755,15 +1961,13 @@ class BudgetApp:
 
     def create_pie_sections(self, period='1M'):
         expense_categories = self.get_expenses_selected_by_date(period)
-        category_colors = self.get_category_colors()
-
         total_amount = sum(expense_categories.values())
 
         pie_sections = [ft.PieChartSection(
             value=amount,
             title=f"{category}\n{(amount / total_amount) * 100:.1f}%",
             radius=100,
-            color=category_colors.get(category, ft.colors.GREY_500)
+            color=self.get_category_color(category)
         )
             for category, amount in expense_categories.items()
         ]
@@ -1771,8 +1975,6 @@ class BudgetApp:
 
     def create_bars(self, period='1M'):
         expense_categories = self.get_expenses_selected_by_date(period)
-        category_colors = self.get_category_colors()
-
         if not expense_categories:
             return []
 
@@ -1785,7 +1987,7 @@ class BudgetApp:
                         from_y=0,
                         to_y=amount,
                         width=40,
-                        color=category_colors.get(category, ft.colors.GREY_500),
+                        color=self.get_category_color(category),
                         tooltip=f"{category}: ${amount:.2f}",
                         border_radius=0,
                     )
@@ -1795,8 +1997,6 @@ class BudgetApp:
 
     def create_line_chart_data(self, period='1M'):
         expenses_by_category_date, sorted_dates = self.get_expenses_by_date_and_category(period)
-        category_colors = self.get_category_colors()
-
         if not expenses_by_category_date or not sorted_dates:
             return []
 
@@ -1811,7 +2011,7 @@ class BudgetApp:
             line_chart_series.append(ft.LineChartData(
                 data_points=data_points,
                 stroke_width=3,
-                color=category_colors.get(category, ft.colors.GREY_500),
+                color=self.get_category_color(category),
                 curved=True,
                 stroke_cap_round=True,
                 prevent_curve_over_shooting=True,
@@ -1969,7 +2169,7 @@ class BudgetApp:
         if not self.highest_expenses:
             return ft.Column([ft.Text("No expenses recorded yet")])
 
-        expenses_to_show = self.highest_expenses[:3]
+        expenses_to_show = self.highest_expenses[:HIGHEST_EXPENSES_SHOWN]
 
         expense_controls = [
             ft.Text("Highest Expenses:", weight=ft.FontWeight.BOLD, color=self.theme_color.text_primary)
@@ -1982,6 +2182,18 @@ class BudgetApp:
                 ] , spacing=5)
             )
 
+        biggest_spends = self.get_biggest_spends()
+        if biggest_spends:
+            expense_controls.append(
+                ft.Text("Biggest Spends:", weight=ft.FontWeight.BOLD, color=self.theme_color.text_primary))
+            for expense, amount in biggest_spends:
+                expense_controls.append(
+                    ft.Row([ft.Icon(self.get_category_icon(expense.get('category')), color=self.theme_color.text_primary),
+                    ft.Text(f" {expense.get('description') or expense.get('category')}: {amount:.2f}"
+                            f" {self.currency}", color=self.theme_color.text_primary)
+                    ], spacing=5)
+                )
+
         return ft.Column(expense_controls, spacing=5)
 
     def get_upcoming_transactions(self, expense_list = None):
@@ -2004,7 +2216,7 @@ class BudgetApp:
             selected_date = e.control.value
             self.recurring_day = selected_date
             self.recurring_date_button.text = f"Recurring Date: {selected_date.strftime('%Y-%m-%d')}"
-            self.page.update()
+            self.render.mark()
             try:
                 self.show_snackbar("Recurring day saved!")
 
@@ -2017,6 +2229,8 @@ class BudgetApp:
     def open_recurring_date_picker(self, e):
         self.recurring_date_picker.pick_date()
 
+    @in_render_batch
+    @holding_data_lock
     def update_displays(self):
         """Update all display components"""
         self.update_budget_summary()
@@ -2034,14 +2248,17 @@ class BudgetApp:
         return months
 
 
+    @in_render_batch
+    @holding_data_lock
     def automaticaly_update_expense(self):
         for expense in self.recurring_expenses:
             try:
-                if type(expense['recurring day']) is not str:
-                    expense['recurring day'] = expense['recurring day'].strftime('%Y-%m-%d %H:%M:%S')
-                if expense['recurring day'] <= datetime.now().strftime('%Y-%m-%d %H:%M:%S'):
+                record = self.get_expense_record(expense)
+                due_date = record.recurring_day
+                if due_date and record.recurring_second <= epoch_seconds(datetime.now()):
                     months = self.get_recurring_period(expense['is recurring'])
-                    new_date = expense['recurring day'] + relativedelta(months=months)
+                    new_date = due_date + relativedelta(months=months)
+                    expense['recurring day'] = new_date.strftime('%Y-%m-%d %H:%M:%S')
                     expense_data = {
                         'user id': self.user_id,
                         'amount': expense['amount'],
@@ -2049,7 +2266,7 @@ class BudgetApp:
                         'description': expense['description'],
                         'impulse index': expense.get('impulse index', None),
                         'date': expense['date'],
-                        'timestamp': expense['timestamp'],
+                        'timestamp': datetime.now(),
                         'shared': expense['shared'],
                         'owe status': expense['owe status'],
                         'percentage': expense['percentage'],
@@ -2057,26 +2274,24 @@ class BudgetApp:
                         'recurring day': new_date
                     }
 
-                    if not self.db:
-                        db = firestore.client()
-                    # Save to Firebase if available
-                    if self.db:
-                        doc_ref = self.db.collection('users').document(self.user_id).collection('expenses').add(
-                            expense_data)
-                        expense_data['id'] = expense['id']
-                        doc_ref = self.db.collection('expenses').document(expense['id'])
-                        doc_ref.update({'recurring day': new_date.strftime('%Y-%m-%d %H:%M:%S')})
-                    else:
-                        # Generate a temporary ID for local storage
-                        expense_data['id'] = f"local_{len(self.expenses)}"
+                    expense_data['id'] = new_document_id()
+                    # The new occurrence and the advanced recurring day commit together
+                    self.write_queue.enqueue([
+                        expense_write(self.user_path('expenses', expense_data['id']), expense_data),
+                        expense_write(self.user_path('expenses', expense['id']),
+                                      {'recurring day': expense['recurring day']})
+                    ])
+                    self.local_store.upsert('expenses', self.user_id, [expense_data, expense])
 
                     self.expenses.append(expense_data)
+                    self.on_expenses_changed([expense_data, expense])
                     self.update_budget_summary()
-                    self.page.update()
                     self.show_snackbar("Expense added successfully!")
             except Exception as e:
                 print(e)
 
+    @in_render_batch
+    @holding_data_lock
     def add_expense_from_wish_list(self, wish_id):
         "Moves entry from wish list to expense list"
         try:
@@ -2097,42 +2312,34 @@ class BudgetApp:
 
             # Remove from local data
             self.wishes = [wish for wish in self.wishes if wish.get('id') != wish_id]
+            self.on_wishes_changed(deleted=[wish_id])
 
-            if not self.db:
-                db = firestore.client()
-            # Save to Firebase if available
-            if self.db:
-                doc_ref = self.db.collection('users').document(self.user_id).collection('expenses').add(expense_data)
-                expense_data['id'] = wish_to_expense['id']
-                doc_ref = self.db.collection('expenses').document(wish_to_expense['id'])
-
-                self.db.collection('wish_list').document(wish_id).delete()
-
-                # Remove from local data
-                self.wishes = [wish for wish in self.wishes if wish.get('id') != wish_id]
-            else:
-                # Generate a temporary ID for local storage
-                expense_data['id'] = f"local_{len(self.expenses)}"
+            expense_data['id'] = new_document_id()
+            # The expense is added and the wish removed in one commit
+            self.write_queue.enqueue([
+                expense_write(self.user_path('expenses', expense_data['id']), expense_data),
+                delete_write(self.user_path('wish_list', wish_id))
+            ])
+            self.local_store.upsert('expenses', self.user_id, [expense_data])
+            self.local_store.delete('wishes', self.user_id, [wish_id])
 
             self.expenses.append(expense_data)
+            self.on_expenses_changed([expense_data])
             self.update_wish_list()
             self.update_expenses_list()
             self.update_budget_summary()
-            self.page.update()
             self.show_snackbar("Expense added successfully!")
 
         except Exception as e:
             print(e)
     def create_expense_item(self, expense):
         category = expense.get('category', '')
-        category_colors = self.get_category_colors()
-        category_color = category_colors.get(category, ft.colors.BLUE_300)
-
+        badge_color = self.get_category_color(category, ft.colors.BLUE_300)
 
         category_badge = ft.Container(
             content=ft.Row([
-                ft.Icon(self.get_category_icon(category), color=category_color),
-                ft.Text(category, size=12, weight=ft.FontWeight.W_500, color=category_color),
+                ft.Icon(self.get_category_icon(category), color=badge_color),
+                ft.Text(category, size=12, weight=ft.FontWeight.W_500, color=badge_color),
                 ], spacing=8),
                 padding=ft.padding.symmetric(horizontal=12, vertical=6),
                 bgcolor=self.theme_color.teal_card,
@@ -2248,21 +2455,19 @@ class BudgetApp:
         ) )
         return expense_item
 
-    def update_expenses_list(self, e=None):
-        """Update the expenses list display"""
-        self.expenses_list.controls.clear()
+    def get_filtered_expenses(self):
+        """Expenses matching the category, occurrence and period filters of the expenses tab"""
         filtered_expenses = self.expenses
-
-
-        if not self.expenses:
-            self.expenses_list.controls.append(
-                ft.Text("No expenses recorded yet.", color=ft.colors.GREY_600)
-            )
-        else:
+        if self.expenses:
             recurring_filter = self.occurence_filter.value
             selected_period = self.time_period_filter.value
+            if selected_period in PERIOD_DAYS:
+                # Only the period's slice of the date index is scanned by the other filters
+                since = ExpenseLedger.seconds_ago(timedelta(days=PERIOD_DAYS[selected_period]))
+                filtered_expenses = self.get_expenses_between(after_second=since)
+
             if self.category_filter.value and self.category_filter.value != 'All':
-                filtered_expenses = [exp for exp in self.expenses if exp['category'] == self.category_filter.value]
+                filtered_expenses = [exp for exp in filtered_expenses if exp['category'] == self.category_filter.value]
 
             if recurring_filter == "Periodic":
                 filtered_expenses = [exp for exp in filtered_expenses if exp['is recurring'] != "No"]
@@ -2270,152 +2475,158 @@ class BudgetApp:
             elif recurring_filter == "Not Periodic":
                 filtered_expenses = [exp for exp in filtered_expenses if exp['is recurring'] == "No"]
 
-            if selected_period == "1M":
-                filtered_expenses = [exp for exp in filtered_expenses if exp['date'] >=
-                                     (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d %H:%M:%S")]
-            elif selected_period == "2M":
-                filtered_expenses = [exp for exp in filtered_expenses if exp['date'] >=
-                                     (datetime.now() - timedelta(days=60)).strftime("%Y-%m-%d %H:%M:%S")]
-
-            elif selected_period == "3M":
-                filtered_expenses = [exp for exp in filtered_expenses if exp['date'] >=
-                                     (datetime.now() - timedelta(days=90)).strftime("%Y-%m-%d %H:%M:%S")]
-
-            elif selected_period == "6M" == 3:
-                filtered_expenses = [exp for exp in filtered_expenses if exp['date'] >=
-                                     (datetime.now() - timedelta(days=180)).strftime("%Y-%m-%d %H:%M:%S")]
+        return filtered_expenses
 
-            elif selected_period == "12M":
-                filtered_expenses = [exp for exp in filtered_expenses if exp['date'] >=
-                                     (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d %H:%M:%S")]
+    @holding_data_lock
+    def update_expenses_list(self, e=None):
+        """Update the expenses list display, a filter change starts again from the first page"""
+        if self.expenses_tab is None:
+            return  # Filled in when the tab is first selected
+        if e is not None:
+            self.expense_list_limit = EXPENSE_PAGE_SIZE
+        self.filtered_expenses = self.get_filtered_expenses() if self.expenses else []
+        self.render_expense_window()
+
+    def render_expense_window(self):
+        """Show the first `expense_list_limit` filtered expenses, sending only the cards that changed"""
+        shown = self.filtered_expenses[:self.expense_list_limit]
+        remaining = len(self.filtered_expenses) - len(shown)
+        footer = None
+        if remaining > 0:
+            self.expense_list_more_button.text = f"Show more ({remaining} left)"
+            footer = self.expense_list_more_button
+        self.expense_list_view.reconcile(
+            shown,
+            placeholder=None if self.expenses else ft.Text("No expenses recorded yet.", color=ft.colors.GREY_600),
+            footer=footer,
+            context=self.currency  # The cards show amounts in it
+        )
 
-            for expense in (filtered_expenses):
-                expense_card = self.create_expense_item(expense)
-                self.expenses_list.controls.append(expense_card)
+    @holding_data_lock
+    def load_more_expenses(self, e=None):
+        if self.expense_list_limit >= len(self.filtered_expenses):
+            return
+        self.expense_list_limit += EXPENSE_PAGE_SIZE
+        self.render_expense_window()
 
-        self.page.update()
+    @holding_data_lock
+    def on_expenses_list_scroll(self, e):
+        if e.pixels is not None and e.max_scroll_extent is not None \
+                and e.pixels >= e.max_scroll_extent - EXPENSE_LIST_LOAD_AHEAD:
+            self.load_more_expenses()
 
-    def update_wish_list(self, e=None):
-        """Update the wish list display"""
-        self.wish_list.controls.clear()
+    def get_filtered_wishes(self):
+        """Wishes matching the period filter of the wish list tab"""
         filtered_wishes = self.wishes
-
-        if not self.wishes:
-            self.expenses_list.controls.append(
-                ft.Text("No Wishes recorded yet.", color=self.theme_color.text_primary)
-            )
-        else:
+        if self.wishes:
             if self.wish_period_filter.value:
                 selected_period = self.wish_period_filter.value
             else:
                 selected_period = "1M"
-            if selected_period == "1M":
-                filtered_wishes = [wish for wish in self.wishes if wish['date'] >=
-                                   (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d %H:%M:%S")]
-            elif selected_period == "2M":
-                filtered_wishes = [wish for wish in self.wishes if wish['date'] >=
-                                   (datetime.now() - timedelta(days=60)).strftime("%Y-%m-%d %H:%M:%S")]
-
-            elif selected_period == "3M":
-                filtered_wishes = [wish for wish in self.wishes if wish['date'] >=
-                                   (datetime.now() - timedelta(days=90)).strftime("%Y-%m-%d %H:%M:%S")]
-
-            elif selected_period == "6M":
-                filtered_wishes = [wish for wish in self.wishes if wish['date'] >=
-                                   (datetime.now() - timedelta(days=180)).strftime("%Y-%m-%d %H:%M:%S")]
-
-            elif selected_period == "12M":
-                filtered_wishes = [wish for wish in self.wishes if wish['date'] >=
-                                   (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d %H:%M:%S")]
-
-            for wish in reversed(filtered_wishes):
-                category = wish.get('category', '')
-                category_colors = self.get_category_colors()
-                category_color = category_colors.get(category, self.theme_color.logo_in_blue)
-
-                category_badge = ft.Container(
-                    content=ft.Row([
-                        ft.Icon(self.get_category_icon(category), color=category_color),
-                        ft.Text(category, size=12, weight=ft.FontWeight.W_500, color=category_color),
-                    ], spacing=8),
-                    padding=ft.padding.symmetric(horizontal=12, vertical=6),
-                    bgcolor=self.theme_color.purple_card,
-                    border_radius=20,
-                )
-                wish_card = ft.Card(
-                            content=ft.Container(
-                                content=ft.Column([
-                                # Header row
+            if selected_period in PERIOD_DAYS:
+                since = ExpenseLedger.seconds_ago(timedelta(days=PERIOD_DAYS[selected_period]))
+                wish_ids = self.wish_index.ids_between(since_second=since, newest_first=True)
+                filtered_wishes = [self.wishes_by_id[wish_id] for wish_id in wish_ids]
+
+        return filtered_wishes
+
+    @holding_data_lock
+    def update_wish_list(self, e=None):
+        """Update the wish list display, sending only the cards that changed"""
+        if self.wish_list_tab is None:
+            return  # Filled in when the tab is first selected
+        self.wish_list_view.reconcile(
+            list(reversed(self.get_filtered_wishes())),
+            placeholder=None if self.wishes else ft.Text("No Wishes recorded yet.", color=self.theme_color.text_primary),
+            context=self.currency
+        )
+
+    def create_wish_item(self, wish):
+        category = wish.get('category', '')
+        badge_color = self.get_category_color(category, self.theme_color.logo_in_blue)
+
+        category_badge = ft.Container(
+            content=ft.Row([
+                ft.Icon(self.get_category_icon(category), color=badge_color),
+                ft.Text(category, size=12, weight=ft.FontWeight.W_500, color=badge_color),
+            ], spacing=8),
+            padding=ft.padding.symmetric(horizontal=12, vertical=6),
+            bgcolor=self.theme_color.purple_card,
+            border_radius=20,
+        )
+        wish_card = ft.Card(
+                    content=ft.Container(
+                        content=ft.Column([
+                        # Header row
+                        ft.Row([
+                            ft.Column([
                                 ft.Row([
-                                    ft.Column([
-                                        ft.Row([
-                                            ft.Text(
-                                                wish["description"],
-                                                size=16,
-                                                weight=ft.FontWeight.W_600,
-                                                color=self.theme_color.text_primary
-                                                ),
-                                        ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
-                                        category_badge
-                                    ], spacing=4, expand=True),
-                                ft.Column([
-                                    ft.Row([
+                                    ft.Text(
+                                        wish["description"],
+                                        size=16,
+                                        weight=ft.FontWeight.W_600,
+                                        color=self.theme_color.text_primary
+                                        ),
+                                ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
+                                category_badge
+                            ], spacing=4, expand=True),
+                        ft.Column([
+                            ft.Row([
 							            ft.ElevatedButton(text="Acquired this",
-                                                          color=self.theme_color.text_secondary,
-                                                            style=ft.ButtonStyle(
-                                                            shape=ft.RoundedRectangleBorder(radius=10),
-                                                            ),
-                                                            bgcolor=self.theme_color.purple_card,
-                                                            on_click=lambda e, wish_id=wish.get(
-                                                          'id'): self.add_expense_from_wish_list(wish_id)),
-                            ft.IconButton(
-                                icon=ft.icons.EDIT,
-                                icon_color=self.theme_color.purple_text,
-                                on_click=lambda e, wish_id=wish.get('id'): self.show_edit_wish_dialog(wish_id)
-                            ),
-                            ft.IconButton(
-                                icon=ft.icons.DELETE,
-                                icon_color=ft.colors.RED,
-                                on_click=lambda e, wish_id=wish.get('id'): self.delete_expense(wish_id)
-                            )
-                        ], ),
-                    ft.Text(
-                        f"{wish['amount']:.2f} {self.currency}",
-                        size=18,
-                        weight=ft.FontWeight.W_700,
-                        color=self.theme_color.text_primary
+                                                  color=self.theme_color.text_secondary,
+                                                    style=ft.ButtonStyle(
+                                                    shape=ft.RoundedRectangleBorder(radius=10),
+                                                    ),
+                                                    bgcolor=self.theme_color.purple_card,
+                                                    on_click=lambda e, wish_id=wish.get(
+                                                  'id'): self.add_expense_from_wish_list(wish_id)),
+                    ft.IconButton(
+                        icon=ft.icons.EDIT,
+                        icon_color=self.theme_color.purple_text,
+                        on_click=lambda e, wish_id=wish.get('id'): self.show_edit_wish_dialog(wish_id)
+                    ),
+                    ft.IconButton(
+                        icon=ft.icons.DELETE,
+                        icon_color=ft.colors.RED,
+                        on_click=lambda e, wish_id=wish.get('id'): self.delete_expense(wish_id)
                     )
-                        ]),
-                ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
-
-                # Meta row
-                ft.Row([
-                    ft.Container(
-                        content=ft.Text(
-                            wish["date"],
-                            size=12,
-                            color=self.theme_color.text_secondary
-                        ), width=200),
-                ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN)
-            ], spacing=12),
-                    padding=ft.padding.all(20),
-                    margin=ft.margin.only(bottom=16),
-                    bgcolor=self.theme_color.background,
-                    border_radius=16,
-                    border=ft.border.all(1, ft.colors.GREY_100),
-                    shadow=ft.BoxShadow(
-                spread_radius=0,
-                blur_radius=8,
-                color=ft.colors.with_opacity(0.1, ft.colors.BLACK),
-                offset=ft.Offset(0, 2)
-            ),
-        ) )
-
-                self.wish_list.controls.append(wish_card)
+                ], ),
+            ft.Text(
+                f"{wish['amount']:.2f} {self.currency}",
+                size=18,
+                weight=ft.FontWeight.W_700,
+                color=self.theme_color.text_primary
+            )
+                ]),
+        ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
 
-        self.page.update()
+        # Meta row
+        ft.Row([
+            ft.Container(
+                content=ft.Text(
+                    wish["date"],
+                    size=12,
+                    color=self.theme_color.text_secondary
+                ), width=200),
+        ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN)
+    ], spacing=12),
+            padding=ft.padding.all(20),
+            margin=ft.margin.only(bottom=16),
+            bgcolor=self.theme_color.background,
+            border_radius=16,
+            border=ft.border.all(1, ft.colors.GREY_100),
+            shadow=ft.BoxShadow(
+        spread_radius=0,
+        blur_radius=8,
+        color=ft.colors.with_opacity(0.1, ft.colors.BLACK),
+        offset=ft.Offset(0, 2)
+    ),
+) )
+        return wish_card
 
     def update_analysis_list(self, e=None):
+        if self.expenses_tab is None:
+            return  # Shown in the expenses tab, filled in when it is first selected
         self.analysis_list.controls.clear()
 
         if not self.analysis:
@@ -2514,11 +2725,10 @@ class BudgetApp:
                 self.analysis_list.controls.append(analysis_card)
 
         self.update_analysis_button_state()
-        self.page.update()
+        self.render.mark()
 
     def get_ai_analysis(self, e=None):
-        benchmark_date = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
-        expenses = [expense for expense in self.expenses if expense['date'] > benchmark_date]
+        expenses = self.get_expenses_between(since_day=ExpenseLedger.today() - 30)
         # Check if there are expenses to analyze
         if not expenses:
             print("No expenses found for analysis")
@@ -2681,44 +2891,19 @@ class BudgetApp:
 
         self.page.dialog = self.budget_form_dialog
         self.budget_form_dialog.open = True
-        self.page.update()
+        self.render.mark()
 
     def show_expense_category(self):
-        category_groups = {
-            "Essential Living": ["Groceries", "Housing", "Utilities", "Transportation", "Insurance", "Healthcare"],
-            "Personal Care": ["Personal Care", "Clothing", "Fitness"],
-            "Food & Dining": ["Dining Out", "Coffee", "Snacks"],
-            "Entertainment & Leisure": ["Entertainment", "Hobbies", "Books", "Gaming"],
-            "Technology": ["Digital Services", "Electronics", "Software"],
-            "Family & Social": ["Childcare", "Education", "Gifts", "Pet Care"],
-            "Special Occasions": ["Travel", "Events", "Charity"],
-            "Financial": ["Savings", "Investments", "Debt Payment"],
-            "Miscellaneous": ["Emergency", "Other"]
-        }
-
-        dropdown_options = []
-
-        for group_name, categories in category_groups.items():
-            # Add group header
-            dropdown_options.append(ft.dropdown.Option(
-                text=f"--- {group_name} ---",
-                disabled=True
-            ))
-
-            # Add categories in this group
-            for category in categories:
-                dropdown_options.append(ft.dropdown.Option(
-                    text=category,
-                    key=category
-                ))
-        return dropdown_options
+        """Category dropdown options grouped under disabled headers"""
+        return category_dropdown_options()
 
     def get_friend_data(self):
-        friends_list = FriendsManager(self.user_id).get_friends_list()
-        friend_data = {}
-        for friend in friends_list:
-            friend_data[friend['email']] = friend['userId']
-        return friend_data
+        """Friends' email -> user id, from the shared friends directory"""
+        return dict(FriendsDirectory.for_user(self.user_id).email_to_uid)
+
+    def get_friend_user_id(self, email):
+        """User id of the friend an expense is shared with, None if they are not a friend"""
+        return FriendsDirectory.for_user(self.user_id).user_id_for(email)
 
 
 
@@ -2878,53 +3063,53 @@ class BudgetApp:
         )
 
 
+        @self.render.batched
         def save_expense(e):
-            try:
-                amount = float(amount_input.value or 0)
-                category = category_input.value or ""
-                description = description_input.value or ""
-                shared = share_with_input.value
-                owe_status = owner_input.value
-                is_recurring = recurring_period_input.value
-                if is_recurring not in ['No', 'All']:
-                    recurring_day = self.recurring_day
-                else:
-                    recurring_day = None
+            with self.data_lock:
+                try:
+                    amount = float(amount_input.value or 0)
+                    category = category_input.value or ""
+                    description = description_input.value or ""
+                    shared = share_with_input.value
+                    owe_status = owner_input.value
+                    is_recurring = recurring_period_input.value
+                    if is_recurring not in ['No', 'All']:
+                        recurring_day = self.recurring_day
+                    else:
+                        recurring_day = None
 
-                friend_data = self.get_friend_data()
+                    if amount <= 0:
+                        self.show_snackbar("Please enter a valid amount")
+                        return
+                    friend_id = None
+                    if shared != "No":
+                        friend_id = self.get_friend_user_id(shared)
+                        if friend_id is None:
+                            self.show_snackbar(f"{shared} is not in your friends list")
+                            return
 
-                if amount <= 0:
-                    self.show_snackbar("Please enter a valid amount")
-                    return
-
-                expense_data = {
-                    'user id': self.user_id,
-                    'amount': amount,
-                    'category': category,
-                    'description': description,
-                    'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'timestamp': datetime.now(),
-                    'shared': shared,
-                    'owe status': owe_status,
-                    'percentage': percentage.end_value,
-                    'is recurring': is_recurring,
-                    'recurring day': recurring_day
-                }
-                if not self.db:
-                    self.db = firestore.client()
-                # Save to Firebase if available
-                if self.db:
-                    # Add user ID to ensure data isolation
-                    doc_ref = self.db.collection('users').document(self.user_id).collection('expenses').add(
-                        expense_data)
-                    expense_data['id'] = doc_ref[1].id
+                    expense_data = {
+                        'user id': self.user_id,
+                        'amount': amount,
+                        'category': category,
+                        'description': description,
+                        'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                        'timestamp': datetime.now(),
+                        'shared': shared,
+                        'owe status': owe_status,
+                        'percentage': percentage.end_value,
+                        'is recurring': is_recurring,
+                        'recurring day': recurring_day
+                    }
+                    # Client-generated id, so the expense is usable at once and a replayed write is idempotent
+                    expense_data['id'] = new_document_id()
+                    writes = [expense_write(self.user_path('expenses', expense_data['id']), expense_data)]
 
                     if shared != "No":
                         if owe_status == "I owe the expense":
                             friend_owe_status = "Owes expense"
                         else:
                             friend_owe_status = "I owe the expense"
-                        print(type(percentage.end_value))
                         friend_expense_data = {
                             'user id': self.user_id,
                             'amount': amount,
@@ -2938,32 +3123,32 @@ class BudgetApp:
                             'is recurring': is_recurring,
                             'recurring day': recurring_day
                         }
-                        friend_doc_ref = self.db.collection('users').document(friend_data[shared]).collection(
-                            'expenses').document(expense_data['id'])
-                        friend_doc_ref.set(friend_expense_data)
+                        writes.append(expense_write(self.user_path('expenses', expense_data['id'], friend_id),
+                                                    friend_expense_data))
 
-                else:
-                    # Generate a temporary ID for local storage
-                    expense_data['id'] = f"local_{len(self.expenses)}"
-                    print("⚠️ Firebase not available, expense saved locally only")
-
-                self.expenses.insert(0,expense_data)
-                self.update_expenses_list()
-                self.update_budget_summary()
-                self.create_budget_progress_card()
-                self.create_quick_insights_row()
-                self.create_highest_expenses_card()
-                self.create_upcoming_transactions_card()
-                self.pie_chart.sections = self.create_pie_sections()
-                self.expense_form_dialog.open = False
-                self.page.update()
-                self.show_snackbar("Expense added successfully!")
+                    # Both copies commit together in the background, or once Firebase is reachable
+                    self.write_queue.enqueue(writes)
+                    self.local_store.upsert('expenses', self.user_id, [expense_data])
 
-            except ValueError:
-                self.show_snackbar("Please enter a valid amount")
-            except Exception as ex:
-                self.show_snackbar(f"Error saving expense: {ex}")
-                print(f"❌ Detailed error: {ex}")
+                    self.expenses.insert(0,expense_data)
+                    self.on_expenses_changed([expense_data])
+                    self.update_expenses_list()
+                    self.update_budget_summary()
+                    self.create_budget_progress_card()
+                    self.create_quick_insights_row()
+                    self.create_highest_expenses_card()
+                    self.create_upcoming_transactions_card()
+                    self.pie_chart.sections = self.create_pie_sections()
+                    self.render.mark(self.pie_chart)
+                    self.expense_form_dialog.open = False
+                    self.render.mark(self.expense_form_dialog)
+                    self.show_snackbar("Expense added successfully!")
+
+                except ValueError:
+                    self.show_snackbar("Please enter a valid amount")
+                except Exception as ex:
+                    self.show_snackbar(f"Error saving expense: {ex}")
+                    print(f"❌ Detailed error: {ex}")
 
         self.expense_form_dialog = ft.AlertDialog(
             modal=True,
@@ -3027,7 +3212,7 @@ class BudgetApp:
 
         self.page.dialog = self.expense_form_dialog
         self.expense_form_dialog.open = True
-        self.page.update()
+        self.render.mark()
 
     def create_upload_picture_button(self):
         """Create the upload picture button with mobile camera/gallery options"""
@@ -3127,7 +3312,7 @@ class BudgetApp:
 
             # Update the page to reflect changes
             if self.page:
-                self.page.update()
+                self.render.mark()
 
     def encode_image_to_base64(self, file_path):
         """Convert image file to base64 string"""
@@ -3237,44 +3422,41 @@ class BudgetApp:
 
 
 
+        @self.render.batched
         def save_expense_from_picture(e):
-            try:
-                expense_data = self.create_expense_data_from_image(share_with_input.value,
-                                                                   owner_input.value, percentage.end_value)
-
-                friend_data = self.get_friend_data()
-
-                if not self.db:
-                    self.db = firestore.client()
-                # Save to Firebase if available
-                if self.db:
-                    # Add user ID to ensure data isolation
-                    doc_ref = self.db.collection('users').document(self.user_id).collection('expenses').add(
-                        expense_data)
-                    expense_data['id'] = doc_ref[1].id
-
+            with self.data_lock:
+                try:
+                    friend_id = None
                     if share_with_input.value != "No":
-                        doc_ref = self.db.collection('users').document(friend_data[share_with_input.value]).\
-                            collection('expenses').add(
-                            expense_data)
-                        expense_data['id'] = doc_ref[1].id
-
-                else:
-                    # Generate a temporary ID for local storage
-                    expense_data['id'] = f"local_{len(self.expenses)}"
-
-                self.expenses.insert(0,expense_data)
-                self.update_expenses_list()
-                self.update_budget_summary()
-                self.expense_from_picture_dialog.open = False
-                self.page.update()
-                self.show_snackbar("Expense added successfully!")
+                        friend_id = self.get_friend_user_id(share_with_input.value)
+                        if friend_id is None:
+                            self.show_snackbar(f"{share_with_input.value} is not in your friends list")
+                            return
+                    expense_data = self.create_expense_data_from_image(share_with_input.value,
+                                                                       owner_input.value, percentage.end_value)
+
+                    # The friend's copy shares the id, like expenses added by hand
+                    expense_data['id'] = new_document_id()
+                    writes = [expense_write(self.user_path('expenses', expense_data['id']), expense_data)]
+                    if share_with_input.value != "No":
+                        writes.append(expense_write(self.user_path('expenses', expense_data['id'], friend_id),
+                                                    expense_data))
+                    self.write_queue.enqueue(writes)
+                    self.local_store.upsert('expenses', self.user_id, [expense_data])
+
+                    self.expenses.insert(0,expense_data)
+                    self.on_expenses_changed([expense_data])
+                    self.update_expenses_list()
+                    self.update_budget_summary()
+                    self.expense_from_picture_dialog.open = False
+                    self.render.mark(self.expense_from_picture_dialog)
+                    self.show_snackbar("Expense added successfully!")
 
-            except ValueError:
-                self.show_snackbar("Please enter a valid amount")
-            except Exception as ex:
-                self.show_snackbar(f"Error saving expense: {ex}")
-                print(f"❌ Detailed error: {ex}")
+                except ValueError:
+                    self.show_snackbar("Please enter a valid amount")
+                except Exception as ex:
+                    self.show_snackbar(f"Error saving expense: {ex}")
+                    print(f"❌ Detailed error: {ex}")
 
         self.expense_from_picture_dialog =  ft.AlertDialog(
     modal=True,
@@ -3319,7 +3501,7 @@ class BudgetApp:
 )
         self.page.dialog = self.expense_from_picture_dialog
         self.expense_from_picture_dialog.open = True
-        self.page.update()
+        self.render.mark()
 
     def show_edit_expense_dialog(self, expense_id):
         """Show dialog to edit existing expense"""
@@ -3485,88 +3667,93 @@ class BudgetApp:
             border=ft.border.all(1, ft.colors.GREY_200)
         )
 
+        @self.render.batched
         def update_expense(e):
-            try:
-                amount = float(amount_input.value or 0)
-                category = category_input.value or ""
-                description = description_input.value or ""
-                shared = share_with_input.value
-                owe_status = owner_input.value
-                is_recurring = recurring_period_input.value
-                if is_recurring not in ['No', 'All']:
-                    recurring_day = self.recurring_day
-                else:
-                    recurring_day = None
-
-                friend_data = self.get_friend_data()
-
-                if amount <= 0:
-                    self.show_snackbar("Please enter a valid amount")
-                    return
-
-                expense_data = {
-                    'user id': self.user_id,
-                    'amount': amount,
-                    'category': category,
-                    'description': description,
-                    'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'timestamp': datetime.now(),
-                    'shared': shared,
-                    'owe status': owe_status,
-                    'percentage': percentage.end_value,
-                    'is recurring': is_recurring,
-                    'recurring day': recurring_day
-                }
-
-                if amount <= 0:
-                    self.show_snackbar("Please enter a valid amount")
-                    return
-
-                # Update in Firebase
-                if not self.db:
-                    self.db = firestore.client()
+            with self.data_lock:
+                try:
+                    amount = float(amount_input.value or 0)
+                    category = category_input.value or ""
+                    description = description_input.value or ""
+                    shared = share_with_input.value
+                    owe_status = owner_input.value
+                    is_recurring = recurring_period_input.value
+                    if is_recurring not in ['No', 'All']:
+                        recurring_day = self.recurring_day
+                    else:
+                        recurring_day = None
 
-                self.db.collection('users').document(self.user_id).collection('expenses').document(expense_id)\
-                    .update(expense_data)
+                    if amount <= 0:
+                        self.show_snackbar("Please enter a valid amount")
+                        return
+                    friend_id = None
+                    if shared != "No":
+                        friend_id = self.get_friend_user_id(shared)
+                        if friend_id is None:
+                            self.show_snackbar(f"{shared} is not in your friends list")
+                            return
 
-                if shared != "No":
-                    friend_expense_data = {
+                    expense_data = {
                         'user id': self.user_id,
                         'amount': amount,
                         'category': category,
                         'description': description,
                         'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                         'timestamp': datetime.now(),
-                        'shared': self.display_name,
-                        'owe status': not owe_status,
-                        'percentage': str(100 - float(percentage.end_value)),
+                        'shared': shared,
+                        'owe status': owe_status,
+                        'percentage': percentage.end_value,
                         'is recurring': is_recurring,
                         'recurring day': recurring_day
                     }
-                    self.db.collection('users').document(friend_data[shared]).collection('expenses').document(expense_id)\
-                        .update(friend_expense_data)
-
-                # Update local data
-                for i, exp in enumerate(self.expenses):
-                    if exp.get('id') == expense_id:
-                        self.expenses[i].update(expense_data)
-                        break
-
-                self.update_expenses_list()
-                self.update_budget_summary()
-                self.create_budget_progress_card()
-                self.create_quick_insights_row()
-                self.create_highest_expenses_card()
-                self.create_upcoming_transactions_card()
-                self.edit_expense_dialog.open = False
-                self.page.update()
-                self.show_snackbar("Expense updated successfully!")
 
-            except ValueError:
-                self.show_snackbar("Please enter a valid amount")
-            except Exception as ex:
-                print(f"Editing operation failed with error {ex}")
-                self.show_snackbar(f"Error updating expense: {ex}")
+                    if amount <= 0:
+                        self.show_snackbar("Please enter a valid amount")
+                        return
+
+                    # Update in Firebase, merged writes keep a replay idempotent
+                    writes = [expense_write(self.user_path('expenses', expense_id), expense_data)]
+
+                    if shared != "No":
+                        friend_expense_data = {
+                            'user id': self.user_id,
+                            'amount': amount,
+                            'category': category,
+                            'description': description,
+                            'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                            'timestamp': datetime.now(),
+                            'shared': self.display_name,
+                            'owe status': not owe_status,
+                            'percentage': str(100 - float(percentage.end_value)),
+                            'is recurring': is_recurring,
+                            'recurring day': recurring_day
+                        }
+                        writes.append(expense_write(self.user_path('expenses', expense_id, friend_id),
+                                                    friend_expense_data))
+                    self.write_queue.enqueue(writes)
+
+                    # Update local data
+                    for i, exp in enumerate(self.expenses):
+                        if exp.get('id') == expense_id:
+                            self.expenses[i].update(expense_data)
+                            self.local_store.upsert('expenses', self.user_id, [self.expenses[i]])
+                            self.on_expenses_changed([self.expenses[i]])
+                            break
+
+                    self.update_expenses_list()
+                    self.update_budget_summary()
+                    self.create_budget_progress_card()
+                    self.create_quick_insights_row()
+                    self.create_highest_expenses_card()
+                    self.create_upcoming_transactions_card()
+                    self.edit_expense_dialog.open = False
+                    self.render.mark(self.edit_expense_dialog)
+                    self.show_snackbar("Expense updated successfully!")
+
+                except ValueError:
+                    self.show_snackbar("Please enter a valid amount")
+                except Exception as ex:
+                    print(f"Editing operation failed with error {ex}")
+                    self.show_snackbar(f"Error updating expense: {ex}")
 
         self.edit_expense_dialog = ft.AlertDialog(
             modal=True,
@@ -3628,28 +3815,35 @@ class BudgetApp:
 
         self.page.dialog = self.edit_expense_dialog
         self.edit_expense_dialog.open = True
-        self.page.update()
+        self.render.mark()
 
     def delete_expense(self, expense_id):
         """Delete an expense"""
 
+        @self.render.batched
         def confirm_delete(e):
-            try:
-                # Delete from Firebase
-                self.db.collection('users').document(self.user_id).collection('expenses').document(expense_id).delete()
-
-                # Remove from local data
-                self.expenses = [exp for exp in self.expenses if exp.get('id') != expense_id]
-                self.recurring_expenses = [exp for exp in self.recurring_expenses if exp.get('id') != expense_id]
-
-                self.update_expenses_list()
-                self.update_budget_summary()
-                confirm_dialog.open = False
-                self.page.update()
-                self.show_snackbar("Expense deleted successfully!")
+            with self.data_lock:
+                try:
+                    # Delete from Firebase, the tombstone lets other sessions drop it on their next sync
+                    writes = [delete_write(self.user_path('expenses', expense_id))]
+                    if self.expense_sync:
+                        writes.append(self.expense_sync.tombstone_write(expense_id))
+                    self.write_queue.enqueue(writes)
+                    self.local_store.delete('expenses', self.user_id, [expense_id])
+
+                    # Remove from local data
+                    self.expenses = [exp for exp in self.expenses if exp.get('id') != expense_id]
+                    self.on_expenses_changed(deleted=[expense_id])
+                    self.recurring_expenses = [exp for exp in self.recurring_expenses if exp.get('id') != expense_id]
+
+                    self.update_expenses_list()
+                    self.update_budget_summary()
+                    confirm_dialog.open = False
+                    self.render.mark(confirm_dialog)
+                    self.show_snackbar("Expense deleted successfully!")
 
-            except Exception as ex:
-                self.show_snackbar(f"Error deleting expense: {ex}")
+                except Exception as ex:
+                    self.show_snackbar(f"Error deleting expense: {ex}")
 
         confirm_dialog = ft.AlertDialog(
             modal=True,
@@ -3668,7 +3862,7 @@ class BudgetApp:
         self.create_highest_expenses_card()
         self.create_upcoming_transactions_card()
         confirm_dialog.open = True
-        self.page.update()
+        self.render.mark()
 
     def show_edit_wish_dialog(self, wish_id):
         """Show dialog to edit existing wish item"""
@@ -3725,32 +3919,43 @@ class BudgetApp:
             margin=ft.margin.only(bottom=15)
         )
 
+        @self.render.batched
         def update_wish_item(e):
-            try:
-                amount = float(amount_input.value or 0)
-                category = category_input.value or ""
-                description = description_input.value or ""
-
-                if amount <= 0:
-                    self.show_snackbar("Please enter a valid amount")
-                    return
-
-                # Update in Firebase
-                self.db.collection('users').document(self.user_id).collection('wish_list').document(wish_id).update({
-                    'amount': amount,
-                    'category': category,
-                    'description': description,
-                })
+            with self.data_lock:
+                try:
+                    amount = float(amount_input.value or 0)
+                    category = category_input.value or ""
+                    description = description_input.value or ""
 
-                self.update_wish_list()
-                self.edit_wish_dialog.open = False
-                self.page.update()
-                self.show_snackbar("Wish List Item updated successfully!")
+                    if amount <= 0:
+                        self.show_snackbar("Please enter a valid amount")
+                        return
 
-            except ValueError:
-                self.show_snackbar("Please enter a valid amount")
-            except Exception as ex:
-                self.show_snackbar(f"Error updating wish list item: {ex}")
+                    wish_item_data = {
+                        'amount': amount,
+                        'category': category,
+                        'description': description,
+                    }
+                    # Update in Firebase
+                    self.write_queue.enqueue([set_write(self.user_path('wish_list', wish_id), wish_item_data, merge=True)])
+
+                    # Update local data
+                    for wish in self.wishes:
+                        if wish.get('id') == wish_id:
+                            wish.update(wish_item_data)
+                            self.on_wishes_changed([wish])
+                            self.local_store.upsert('wishes', self.user_id, [wish])
+                            break
+
+                    self.update_wish_list()
+                    self.edit_wish_dialog.open = False
+                    self.render.mark(self.edit_wish_dialog)
+                    self.show_snackbar("Wish List Item updated successfully!")
+
+                except ValueError:
+                    self.show_snackbar("Please enter a valid amount")
+                except Exception as ex:
+                    self.show_snackbar(f"Error updating wish list item: {ex}")
 
         self.edit_wish_dialog = ft.AlertDialog(
             modal=True,
@@ -3804,27 +4009,31 @@ class BudgetApp:
 
         self.page.dialog = self.edit_wish_dialog
         self.edit_wish_dialog.open = True
-        self.page.update()
+        self.render.mark()
 
     def delete_wish_list_item(self, wish_id):
         """Delete a wish list item"""
 
+        @self.render.batched
         def confirm_delete(e):
-            try:
-                # Delete from Firebase
-                self.db.collection('wish_list').document(wish_id).delete()
+            with self.data_lock:
+                try:
+                    # Delete from Firebase
+                    self.write_queue.enqueue([delete_write(self.user_path('wish_list', wish_id))])
+                    self.local_store.delete('wishes', self.user_id, [wish_id])
 
-                # Remove from local data
-                self.wishes = [wish for wish in self.wishes if wish.get('id') != wish_id]
+                    # Remove from local data
+                    self.wishes = [wish for wish in self.wishes if wish.get('id') != wish_id]
+                    self.on_wishes_changed(deleted=[wish_id])
 
-                self.update_wish_list()
-                self.update_budget_summary()
-                confirm_dialog.open = False
-                self.page.update()
-                self.show_snackbar("Expense deleted successfully!")
+                    self.update_wish_list()
+                    self.update_budget_summary()
+                    confirm_dialog.open = False
+                    self.render.mark(confirm_dialog)
+                    self.show_snackbar("Expense deleted successfully!")
 
-            except Exception as ex:
-                self.show_snackbar(f"Error deleting Wish List Item: {ex}")
+                except Exception as ex:
+                    self.show_snackbar(f"Error deleting Wish List Item: {ex}")
 
         confirm_dialog = ft.AlertDialog(
             modal=True,
@@ -3839,45 +4048,47 @@ class BudgetApp:
 
         self.page.dialog = confirm_dialog
         confirm_dialog.open = True
-        self.page.update()
+        self.render.mark()
 
     def close_budget_dialog(self):
         self.budget_form_dialog.open = False
-        self.page.update()
+        self.render.mark(self.budget_form_dialog)
 
     def close_dialog(self, dialog):
         """Close dialog"""
         dialog.open = False
-        self.page.update()
+        self.render.mark(dialog)
 
     def close_expense_dialog(self):
         self.expense_form_dialog.open = False
-        self.page.update()
+        self.render.mark(self.expense_form_dialog)
 
     def close_edit_dialog(self):
         self.edit_expense_dialog.open = False
-        self.page.update()
+        self.render.mark(self.edit_expense_dialog)
 
     def close_confirm_dialog(self):
         if self.page.dialog:
             self.page.dialog.open = False
-            self.page.update()
+            self.render.mark(self.page.dialog)
 
+    @in_render_batch
     def on_start_date_change(self, e):
         start_date = e.control.value
         self.start_date = (datetime.combine(start_date, time.min)).strftime('%Y-%m-%d')
         self.start_date_button.text = f"Start: {self.start_date}"
         self.save_budget_data()
         self.update_budget_summary()
-        self.page.update()
+        self.render.mark(self.start_date_button)
 
+    @in_render_batch
     def on_end_date_change(self, e):
         end_date = e.control.value
         self.end_date = (datetime.combine(end_date, time.min)).strftime('%Y-%m-%d')
         self.end_date_button.text = f"End: {self.end_date}"
         self.save_budget_data()
         self.update_budget_summary()
-        self.page.update()
+        self.render.mark(self.end_date_button)
 
     def show_add_wish_dialog(self, e):
         """Show dialog to add new item on wish list"""
@@ -3928,49 +4139,46 @@ class BudgetApp:
             margin=ft.margin.only(bottom=15)
         )
 
+        @self.render.batched
         def save_wish(e):
-            try:
-                amount = float(amount_input.value or 0)
-                category = category_input.value or ""
-                description = description_input.value or ""
-
-                if amount <= 0:
-                    self.show_snackbar("Please enter a valid amount")
-                    return
-
-                wish_item_data = {
-                    'user id': self.user_id,
-                    'amount': amount,
-                    'category': category,
-                    'description': description,
-                    'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'timestamp': datetime.now(),
+            with self.data_lock:
+                try:
+                    amount = float(amount_input.value or 0)
+                    category = category_input.value or ""
+                    description = description_input.value or ""
 
-                }
-                if not self.db:
-                    self.db = firestore.client()
-                # Save to Firebase if available
-                if self.db:
-                    # Add user ID to ensure data isolation
-                    doc_ref = self.db.collection('users').document(self.user_id).collection('wish_list').add(
-                        wish_item_data)
-                    wish_item_data['id'] = doc_ref[1].id
+                    if amount <= 0:
+                        self.show_snackbar("Please enter a valid amount")
+                        return
 
-                else:
-                    print("⚠️ Firebase not available")
+                    wish_item_data = {
+                        'user id': self.user_id,
+                        'amount': amount,
+                        'category': category,
+                        'description': description,
+                        'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                        'timestamp': datetime.now(),
 
-                self.wishes.append(wish_item_data)
-                self.update_wish_list()
-                self.update_budget_summary()
-                self.wish_list_form_dialog.open = False
-                self.page.update()
-                self.show_snackbar("Wish added successfully!")
+                    }
+                    wish_item_data['id'] = new_document_id()
+                    self.write_queue.enqueue([
+                        set_write(self.user_path('wish_list', wish_item_data['id']), wish_item_data, merge=True)
+                    ])
+                    self.local_store.upsert('wishes', self.user_id, [wish_item_data])
+
+                    self.wishes.append(wish_item_data)
+                    self.on_wishes_changed([wish_item_data])
+                    self.update_wish_list()
+                    self.update_budget_summary()
+                    self.wish_list_form_dialog.open = False
+                    self.render.mark(self.wish_list_form_dialog)
+                    self.show_snackbar("Wish added successfully!")
 
-            except ValueError:
-                self.show_snackbar("Please enter a valid amount")
-            except Exception as ex:
-                self.show_snackbar(f"Error saving item: {ex}")
-                print(f"❌ Detailed error: {ex}")
+                except ValueError:
+                    self.show_snackbar("Please enter a valid amount")
+                except Exception as ex:
+                    self.show_snackbar(f"Error saving item: {ex}")
+                    print(f"❌ Detailed error: {ex}")
 
         self.wish_list_form_dialog = ft.AlertDialog(
             modal=True,
@@ -4030,44 +4238,46 @@ class BudgetApp:
 
         self.page.dialog = self.wish_list_form_dialog
         self.wish_list_form_dialog.open = True
-        self.page.update()
+        self.render.mark()
 
+    @in_render_batch
     def save_budget(self, e):
         """Save budget configuration"""
         try:
             self.budget_amount = float(self.budget_input.value or 0)
             self.currency = self.currency_input.value
             self.save_budget_data()
-            self.update_budget_summary()
+            # Every view shows amounts in the currency, the cards are only rebuilt if it changed
+            self.refresh_data_views()
             self.show_snackbar("Budget saved successfully!")
 
             self.budget_form_dialog.open = False
-            self.page.update()
+            self.render.mark(self.budget_form_dialog)
 
         except ValueError:
             self.show_snackbar("Please enter a valid budget amount")
 
     def save_budget_data(self):
         """Save budget data to Firebase"""
-        if not self.db:
-            print("⚠️ Firebase not initialized, initializing database")
-            self.db = firestore.client()
-
         try:
-            budget_data = {
-                'amount': self.budget_amount,
-                'currency': self.currency,
-                'start_date': self.start_date,
-                'end_date': self.end_date,
-                'updated_at': datetime.now()
-            }
+            budget_data = self.budget_document()
 
             # Save or update budget document
-            self.db.collection('users').document(self.user_id).collection('budget').document('current').set(budget_data)
+            self.write_queue.enqueue([set_write(self.user_path('budget', 'current'), budget_data)])
+            self.local_store.set_document(self.user_id, 'budget', budget_data)
 
         except Exception as e:
             print(f"❌ Error saving budget data: {e}")
 
+    def budget_document(self):
+        return {
+            'amount': self.budget_amount,
+            'currency': self.currency,
+            'start_date': self.start_date,
+            'end_date': self.end_date,
+            'updated_at': datetime.now()
+        }
+
     def load_budget_data(self):
         """Load budget data from Firebase"""
         if not self.db:
@@ -4078,41 +4288,113 @@ class BudgetApp:
             doc = self.db.collection('users').document(self.user_id).collection('budget').document('current').get()
             if doc.exists:
                 data = doc.to_dict()
-                self.budget_amount = data.get('amount', 0)
-                self.currency = data.get('currency')
-                self.start_date = data.get('start_date', self.start_date)
-                self.end_date = data.get('end_date', self.end_date)
+                self.apply_budget_data(data)
+                self.local_store.set_document(self.user_id, 'budget', data)
             else:
                 print("ℹ️ No existing budget data found")
         except Exception as e:
             print(f"❌ Error loading budget data: {e}")
 
+    def apply_budget_data(self, data):
+        self.budget_amount = data.get('amount', 0)
+        self.currency = data.get('currency')
+        self.start_date = data.get('start_date', self.start_date)
+        self.end_date = data.get('end_date', self.end_date)
+
     def load_expenses(self):
-        """Load expenses from Firebase"""
+        """Load new and changed expenses from Firebase and merge them into self.expenses"""
         if not self.db:
             print("⚠️ Firebase not initialized, skipping expenses load")
             self.db = firestore.client()
 
         try:
-            expenses_ref = self.db.collection('users').document(self.user_id).collection('expenses').order_by(
-                'timestamp', direction=firestore.Query.DESCENDING)
-            docs = expenses_ref.stream()
-
-            self.expenses = []
-            for doc in docs:
-                expense_data = doc.to_dict()
-                expense_data['id'] = doc.id
-                self.expenses.append(expense_data)
-                if expense_data['is recurring'] != 'No' and expense_data[
-                    'date'] not in self.recurring_expense_timestamps:
-                    self.recurring_expenses.append(expense_data)
-                    self.recurring_expense_timestamps.append(expense_data['date'])
-
-            self.automaticaly_update_expense()
+            with self.data_lock:
+                if self.expense_sync is None or self.expense_sync.user_id != self.user_id:
+                    # New session or different user: continue from whatever the local store has
+                    self.expense_sync = ExpenseSyncEngine(self.db, self.user_id, self.local_store)
+                    self.expenses = self.local_store.load_collection('expenses', self.user_id)
+                    if not self.expenses:
+                        self.expense_sync.reset()
+                    self.recurring_expenses = []
+                    self.recurring_expense_timestamps = []
+                    self.refresh_recurring_expenses(self.expenses)
+                expense_sync = self.expense_sync
+
+            # The network round trip runs without the lock, the merge below starts from the current list
+            full_load = expense_sync.cursor is None
+            changed, deleted = expense_sync.fetch_changes()
+
+            with self.data_lock:
+                self.expenses, changed, deleted = expense_sync.apply_fetched(self.expenses, changed, deleted,
+                                                                             full_load)
+                if full_load:
+                    self.on_expenses_reloaded()
+                else:
+                    self.on_expenses_changed(changed, deleted)
+                self.expenses_loaded = True
+                print(f"✅ Synced expenses: {len(changed)} changed, {len(deleted)} deleted, {len(self.expenses)} total")
+                self.refresh_recurring_expenses(changed, deleted)
 
         except Exception as e:
             print(f"❌ Error loading expenses: {e}")
 
+    def on_expenses_changed(self, changed=(), deleted=()):
+        """Keep the structures derived from self.expenses in step after expenses were added, edited or deleted"""
+        for expense_id in deleted:
+            self.expense_records.pop(expense_id, None)
+            self.expenses_by_id.pop(expense_id, None)
+        for expense in changed:
+            self.expense_records.pop(expense.get('id'), None)
+            self.expenses_by_id[expense.get('id')] = expense
+        # The ledger parses the dates into its columns, the records are not kept
+        self.expense_ledger.sync(changed, deleted)
+        self.balance_ledger.sync(changed, deleted)
+
+    def on_expenses_reloaded(self):
+        """Rebuild the structures derived from self.expenses after the whole list was replaced"""
+        self.expense_records = {}
+        self.expenses_by_id = {expense.get('id'): expense for expense in self.expenses}
+        self.expense_ledger.rebuild(self.expenses, self.user_id)
+        self.balance_ledger.rebuild(self.expenses, self.user_id)
+
+    def get_expenses_between(self, since_day=None, until_day=None, after_second=None):
+        """Expenses dated in the period, newest first, sliced from the ledger's date index"""
+        expense_ids = self.expense_ledger.ids_between(since_day, until_day, after_second, newest_first=True)
+        return [self.expenses_by_id[expense_id] for expense_id in expense_ids]
+
+    def get_expense_record(self, expense):
+        """The parsed dates of an expense, kept until it changes.
+
+        Only the recurring checks ask for them, so only recurring expenses hold a record.
+        """
+        record = self.expense_records.get(expense.get('id'))
+        if record is None:
+            record = self.expense_records[expense.get('id')] = ExpenseRecord(expense)
+        return record
+
+    def on_wishes_changed(self, changed=(), deleted=()):
+        for wish_id in deleted:
+            self.wishes_by_id.pop(wish_id, None)
+            self.wish_index.remove(wish_id)
+        for wish in changed:
+            self.wishes_by_id[wish.get('id')] = wish
+            self.wish_index.upsert(wish.get('id'), ExpenseRecord(wish).second)
+
+    def on_wishes_reloaded(self):
+        self.wishes_by_id = {wish.get('id'): wish for wish in self.wishes}
+        self.wish_index.rebuild((wish_id, record.second) for wish_id, record in build_records(self.wishes).items())
+
+    def refresh_recurring_expenses(self, changed, deleted=()):
+        """Track recurring expenses among the changed entries, one per original date"""
+        stale_ids = {expense['id'] for expense in changed}.union(deleted)
+        self.recurring_expenses = [exp for exp in self.recurring_expenses if exp.get('id') not in stale_ids]
+        self.recurring_expense_timestamps = [exp['date'] for exp in self.recurring_expenses]
+        for expense_data in changed:
+            if expense_data['is recurring'] != 'No' and expense_data[
+                'date'] not in self.recurring_expense_timestamps:
+                self.recurring_expenses.append(expense_data)
+                self.recurring_expense_timestamps.append(expense_data['date'])
+
     def load_wish_list(self):
         """Load wish list from Firebase"""
         if not self.db:
@@ -4124,12 +4406,16 @@ class BudgetApp:
                 'timestamp', direction=firestore.Query.DESCENDING)
             docs = wish_list_ref.stream()
 
-            self.wishes = []
+            wishes = []
             for doc in docs:
                 wish_data = doc.to_dict()
                 wish_data['id'] = doc.id
-                self.wishes.append(wish_data)
-            print(f"✅ Loaded {len(self.wishes)} wishes from Firebase")
+                wishes.append(wish_data)
+            print(f"✅ Loaded {len(wishes)} wishes from Firebase")
+            with self.data_lock:
+                self.wishes = wishes
+                self.on_wishes_reloaded()
+                self.local_store.replace_collection('wishes', self.user_id, self.wishes)
 
             #self.update_wish_list()
 
@@ -4154,13 +4440,19 @@ class BudgetApp:
                 analysis_data['id'] = doc.id
                 self.analysis.append(analysis_data)
             print(f"✅ Loaded {len(self.analysis)} entries from Firebase")
+            self.local_store.replace_collection('analyses', self.user_id, self.analysis)
 
 
         except Exception as e:
             print(f"❌ Error loading analysis entries: {e}")
 
-    def settle_expense(self, amount, friend):
-        friends = self.get_friend_data()
+    @in_render_batch
+    @holding_data_lock
+    def settle_expense(self, amount, friend, friend_id=None):
+        """Record a payment of `amount` to `friend`, for both of them, which clears that much of the balance"""
+        if friend_id is None:
+            uid_to_name = FriendsDirectory.for_user(self.user_id).uid_to_name
+            friend_id = next((uid for uid, name in uid_to_name.items() if name == friend), None)
         expense_data = {
             'user id': self.user_id,
             'amount': amount,
@@ -4172,35 +4464,40 @@ class BudgetApp:
             'owe status': False,
             'percentage': 0,
             'is recurring': 'No',
-            'recurring day': None
+            'recurring day': None,
+            'settles': friend_id,
+            'paid by': self.user_id
         }
-        if not self.db:
-            db = firestore.client()
-            # Save to Firebase if available
-        if self.db:
-            doc_ref = self.db.collection('users').document(self.user_id).collection('expenses').add(expense_data)
-        else:
-            # Generate a temporary ID for local storage
-            expense_data['id'] = f"local_{len(self.expenses)}"
-            print("⚠️ Firebase not available, expense saved locally only")
+        expense_data['id'] = new_document_id()
+        writes = [expense_write(self.user_path('expenses', expense_data['id']), expense_data)]
+        if friend_id:
+            # The friend's copy lowers their side of the balance, it is shared so it stays out of their budget
+            friend_expense_data = dict(expense_data, **{
+                'description': f"Payment from {self.display_name}",
+                'shared': self.display_name,
+                'owe status': "Owes expense",
+                'settles': self.user_id
+            })
+            writes.append(expense_write(self.user_path('expenses', expense_data['id'], friend_id),
+                                        friend_expense_data))
+        self.write_queue.enqueue(writes)
+        self.local_store.upsert('expenses', self.user_id, [expense_data])
 
         self.expenses.append(expense_data)
+        self.on_expenses_changed([expense_data])
         self.update_expenses_list()
         self.update_budget_summary()
-        self.page.update()
 
     def update_shared_expenses(self):
         "Update the shared expenses display"
-        friends_list = FriendsManager(self.user_id).get_friends_list()
+        friends_directory = FriendsDirectory.for_user(self.user_id)
+        # Net balance per friend id, positive when the friend owes the user
+        balances = self.balance_ledger.balances_by_friend(friends_directory.email_to_uid)
         shared_info = {}
-        for friend in friends_list:
-            shared_info[friend['displayName']] = 0
-            for expense in self.expenses:
-                if expense['shared'] != 'No':
-                    if expense['owe status'] != "I owe the expense":
-                        shared_info[friend['displayName']] -= expense['amount'] * float(expense['percentage']) * 0.01
-                    else:
-                        shared_info[friend['displayName']] += expense['amount'] * float(expense['percentage']) * 0.01
+        friend_ids = {}
+        for friend in friends_directory.friends:
+            shared_info[friend['displayName']] = balances.get(friend['userId'], 0)
+            friend_ids[friend['displayName']] = friend['userId']
 
         if not shared_info:
             return ft.Text("No shared expenses")
@@ -4213,7 +4510,8 @@ class BudgetApp:
                         ft.Text(f"You owe {person}: {abs(amount):.2f} {self.currency}", color=self.theme_color.text_primary),
                         ft.ElevatedButton(
                             text="Settle",
-                            on_click=lambda e, amount=abs(shared_info[person]): self.settle_expense(amount, person)
+                            on_click=lambda e, amount=abs(amount), person=person:
+                                self.settle_expense(amount, person, friend_ids[person])
                         )
                     ]),
                     padding=5
@@ -4228,18 +4526,22 @@ class BudgetApp:
 
         return ft.Column(expense_items, spacing=5)
 
+    def get_budget_metrics(self):
+        """The current period's snapshot of budget metrics, shared by every overview card"""
+        fallback_total = None
+        # Until the expense history is loaded, the server-side total of the current period stands in
+        if not self.expenses_loaded and self.period_total and self.period_total[0] == self.start_date:
+            fallback_total = self.period_total[1]
+        return self.budget_metrics.snapshot(self.start_date, self.end_date, self.budget_amount, fallback_total)
+
     def get_total_expenses(self):
-        start_date = self.start_date
-        total_expenses = sum(expense.get('amount', 0) for expense in self.expenses if
-                             (expense['shared'] == 'No' or expense['owe status']
-                              is not True and expense['user id'] == self.user_id)
-                             and (start_date <= expense['date']))
-        return total_expenses
+        return self.get_budget_metrics().total_expenses
 
     def update_budget_summary(self):
         """Update the budget summary display"""
-        total_expenses = self.get_total_expenses()
-        remaining_budget = self.budget_amount - total_expenses
+        metrics = self.get_budget_metrics()
+        total_expenses = metrics.total_expenses
+        remaining_budget = metrics.remaining_budget
         start_date_obj = datetime.strptime(self.start_date, "%Y-%m-%d").date()
         end_date_obj = datetime.strptime(self.end_date, "%Y-%m-%d").date()
         current_date = datetime.now().date()
@@ -4259,12 +4561,9 @@ class BudgetApp:
             # Convert back to strings
             self.start_date = start_date_obj.strftime("%Y-%m-%d")
             self.end_date = end_date_obj.strftime("%Y-%m-%d")
-            total_expenses = self.get_total_expenses()
-            remaining_budget = self.budget_amount - total_expenses
-
-            if not self.db:
-                print("⚠️ Firebase not initialized, initializing database")
-                self.db = firestore.client()
+            metrics = self.get_budget_metrics()
+            total_expenses = metrics.total_expenses
+            remaining_budget = metrics.remaining_budget
 
             try:
                 update_data = {
@@ -4274,8 +4573,8 @@ class BudgetApp:
                 }
 
                 # Save or update budget document
-                self.db.collection('users').document(self.user_id).collection('budget').document('current').update(
-                    update_data)
+                self.write_queue.enqueue([set_write(self.user_path('budget', 'current'), update_data, merge=True)])
+                self.local_store.set_document(self.user_id, 'budget', self.budget_document())
 
             except Exception as e:
                 print(f"❌ Error saving budget data: {e}")
@@ -4377,8 +4676,7 @@ class BudgetApp:
         ], spacing=0)
 
 
-        if self.page:
-            self.page.update()
+        self.render.mark(self.budget_summary)
 
     def reset_password(self, e):
         """Handle password reset request"""
@@ -4407,7 +4705,7 @@ class BudgetApp:
                 # Show error in dialog
                 error_text.value = "Please enter your email address"
                 error_text.color = ft.colors.RED
-                self.page.update()
+                self.render.mark()
 
         error_text = ft.Text("")
 
@@ -4426,7 +4724,7 @@ class BudgetApp:
 
         self.page.dialog = reset_dialog
         reset_dialog.open = True
-        self.page.update()
+        self.render.mark()
 
     def send_password_reset_email(self, email):
         """Send password reset email using Firebase Auth with actual email sending"""
@@ -4436,7 +4734,7 @@ class BudgetApp:
             if not self.is_valid_email(email):
                 self.status_text.value = "Please enter a valid email address"
                 self.status_text.color = ft.colors.RED
-                self.page.update()
+                self.render.mark()
                 return
 
             auth.generate_password_reset_link(email)
@@ -4479,13 +4777,13 @@ class BudgetApp:
 
         self.page.dialog = success_dialog
         success_dialog.open = True
-        self.page.update()
+        self.render.mark()
 
         # Clear status text and reset form
         self.status_text.value = ""
         self.email_field.value = ""
         self.password_field.value = ""
-        self.page.update()
+        self.render.mark()
 
     def is_valid_email(self, email):
         """Basic email validation"""
@@ -4495,10 +4793,13 @@ class BudgetApp:
         return re.match(pattern, email) is not None
 
     def show_snackbar(self, message):
-        """Show a snackbar with a message"""
-        self.page.snack_bar = ft.SnackBar(content=ft.Text(message))
-        self.page.snack_bar.open = True
-        self.page.update()
+        """Show a snackbar with a message, sent with the rest of the handler's batch"""
+        self.snackbar.content.value = message
+        self.snackbar.open = True
+        if self.snackbar.page:
+            self.render.mark(self.snackbar)
+        else:
+            self.render.mark()  # The first page update puts the overlay on the client
 
     def show_error_dialog(self, message):
         """Show error dialog"""
@@ -4509,65 +4810,22 @@ class BudgetApp:
         )
         self.page.dialog = dialog
         dialog.open = True
-        self.page.update()
+        self.render.mark()
 
     def get_category_icon(self, category):
-        icons_map = {
-            # Essential Living
-            "Groceries": ft.icons.SHOPPING_CART,
-            "Housing": ft.icons.HOME,
-            "Utilities": ft.icons.BOLT,
-            "Transportation": ft.icons.DIRECTIONS_CAR,
-            "Insurance": ft.icons.SECURITY,
-            "Healthcare": ft.icons.LOCAL_HOSPITAL,
-            # Personal Care
-            "Personal Care": ft.icons.FACE,
-            "Clothing": ft.icons.CHECKROOM,
-            "Fitness": ft.icons.FITNESS_CENTER,
-            # Food & Dining
-            "Dining Out": ft.icons.RESTAURANT,
-            "Coffee": ft.icons.COFFEE,
-            "Snacks": ft.icons.FASTFOOD,
-            # Entertainment & Leisure
-            "Entertainment": ft.icons.MOVIE,
-            "Hobbies": ft.icons.PALETTE,
-            "Books": ft.icons.BOOK,
-            "Gaming": ft.icons.SPORTS_ESPORTS,
-            # Technology
-            "Digital Services": ft.icons.CLOUD,
-            "Electronics": ft.icons.DEVICES,
-            "Software": ft.icons.COMPUTER,
-            # Family & Social
-            "Childcare": ft.icons.CHILD_CARE,
-            "Education": ft.icons.SCHOOL,
-            "Gifts": ft.icons.CARD_GIFTCARD,
-            "Pet Care": ft.icons.PETS,
-            # Special Occasions
-            "Travel": ft.icons.FLIGHT,
-            "Events": ft.icons.CELEBRATION,
-            "Charity": ft.icons.VOLUNTEER_ACTIVISM,
-            # Financial
-            "Savings": ft.icons.SAVINGS,
-            "Investments": ft.icons.TRENDING_UP,
-            "Debt Payment": ft.icons.PAYMENT,
-            # Miscellaneous
-            "Emergency": ft.icons.WARNING,
-            "Other": ft.icons.MORE_HORIZ
-        }
-        return icons_map.get(category, ft.icons.MONEY)
-
-    def get_highest_expenses_list(self):
-        expense_categories = {}
-        reference_date = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d %H:%M:%S")
-        for expense in self.expenses:
-            if expense['category'] in expense_categories.keys() and expense['date'] > reference_date:
-                expense_categories[expense['category']] += expense['amount']
-            else:
-                if expense['date'] > reference_date:
-                    expense_categories[expense['category']] = expense['amount']
-        highest_expenses = list(sorted(expense_categories.items(), key=lambda item: item[1]))[::-1]
+        return category_icon(category)
+
+    def get_highest_expenses_list(self, limit=HIGHEST_EXPENSES_SHOWN):
+        """[(category, amount)] of the categories with the most spending in the last 30 days, highest first"""
+        return self.expense_ledger.top_categories(limit, since_day=ExpenseLedger.today() - 30)
 
-        return highest_expenses
+    def get_biggest_spends(self, limit=HIGHEST_EXPENSES_SHOWN, since_day=None, until_day=None):
+        """[(expense, amount)] of the largest single expenses, by default of the current budget period"""
+        if since_day is None:
+            since_day = ExpenseLedger.day_of(self.start_date)
+        return [(self.expenses_by_id[expense_id], amount)
+                for expense_id, amount in self.expense_ledger.largest_expenses(limit, since_day, until_day)
+                if expense_id in self.expenses_by_id]
 
     def load_settings(self) -> Dict:
         """Load settings from db or file or create default settings"""
@@ -4585,29 +4843,59 @@ class BudgetApp:
             return self.default_settings.copy()
         try:
             print("loading settings from db")
-            #doc = self.db.collection('users').document(self.user_id).collection('settings').document('display_name').get()
-            doc_name = self.db.collection('users').document(self.user_id).collection('settings').document('display_name').get()
-            doc_avatar = self.db.collection('users').document(self.user_id).collection('settings').document(
-                'avatar').get()
-            doc_theme = self.db.collection('users').document(self.user_id).collection('settings').document(
-                'theme').get()
-            if doc_name:
-                data = doc_name.to_dict()
-                self.display_name = data.get('display_name')
-                print("Loading avatar")
-                data = doc_avatar.to_dict()
-                self.current_avatar = data.get('avatar_path')
-                print(f"avatar is {self.current_avatar}")
-                print("loading theme")
-                data = doc_theme.to_dict()
-                self.is_dark_mode = data.get('theme')
+            settings_ref = self.db.collection('users').document(self.user_id).collection('settings')
+            profile_ref = settings_ref.document(SETTINGS_DOCUMENT)
+            legacy_refs = [settings_ref.document(doc_id) for doc_id in LEGACY_SETTINGS_FIELDS]
+
+            # One batched read for the settings document and any per-field documents left to migrate
+            data = {}
+            legacy_data = {}
+            for doc in self.db.get_all([profile_ref] + legacy_refs):
+                if not doc.exists:
+                    continue
+                if doc.id == SETTINGS_DOCUMENT:
+                    data.update(doc.to_dict())
+                else:
+                    field = LEGACY_SETTINGS_FIELDS[doc.id]
+                    legacy_data[field] = doc.to_dict().get(field)
 
+            if legacy_data:
+                data = {**legacy_data, **data}
+                self.migrate_legacy_settings(profile_ref, legacy_refs, data)
 
+            if data:
+                self.apply_settings_data(data)
+                print(f"avatar is {self.current_avatar}")
+                self.local_store.set_document(self.user_id, 'settings', self.settings_document())
             else:
                 print("ℹ️ No existing settings data found")
         except Exception as e:
             print(f"❌ Error loading settings data: {e}")
 
+    def migrate_legacy_settings(self, profile_ref, legacy_refs, data):
+        """Fold the old per-field settings documents into the single settings document"""
+        try:
+            batch = self.db.batch()
+            batch.set(profile_ref, data, merge=True)
+            for ref in legacy_refs:
+                batch.delete(ref)
+            batch.commit()
+            print(f"✅ Migrated settings to settings/{SETTINGS_DOCUMENT}")
+        except Exception as e:
+            print(f"❌ Error migrating settings: {e}")
+
+    def settings_document(self):
+        return {
+            'display_name': self.display_name,
+            'avatar_path': self.current_avatar,
+            'theme': self.is_dark_mode
+        }
+
+    def apply_settings_data(self, data):
+        self.display_name = data.get('display_name', self.display_name)
+        self.current_avatar = data.get('avatar_path', self.current_avatar)
+        self.is_dark_mode = data.get('theme', self.is_dark_mode)
+
     def save_settings_to_file(self, file, data):
         try:
             with open(file, 'w') as f:
@@ -4615,6 +4903,7 @@ class BudgetApp:
         except IOError:
             print("Error saving settings")
 
+    @in_render_batch
     def save_settings(self, e=None):
         """Save current settings to file"""
         if not self.db:
@@ -4622,15 +4911,22 @@ class BudgetApp:
             self.save_settings_to_file(self.settings_file, self.settings)
         else:
             self.display_name = self.name_input.value
-            self.db.collection('users').document(self.user_id).set({"displayName":self.display_name}, merge=True)
-            self.update_user_profile(self.user_id, 'display_name', self.display_name)
+            # Profile and settings document change together in a single commit
+            self.write_queue.enqueue([
+                set_write(f"users/{self.user_id}", {"displayName": self.display_name}, merge=True),
+                set_write(self.user_path('settings', SETTINGS_DOCUMENT), {'display_name': self.display_name},
+                          merge=True)
+            ])
+            self.local_store.set_document(self.user_id, 'settings', self.settings_document())
 
             self.settings.update({"avatar": self.current_avatar,
                             'display_name': self.display_name})
             self.save_settings_to_file(self.settings_file, self.settings)
+            self.current_user['displayName'] = self.display_name
+            self.display_name_text.value = self.display_name
+            self.render.mark(self.display_name_text)
         self.display_name_form_dialog.open = False
-        self.page.update()
-        self.show_main()
+        self.render.mark(self.display_name_form_dialog)
 
     def get_setting(self, key: str):
         """Get a specific setting value"""
@@ -4664,7 +4960,7 @@ class BudgetApp:
 
         self.page.dialog = self.display_name_form_dialog
         self.display_name_form_dialog.open = True
-        self.page.update()
+        self.render.mark()
 
     def open_settings_menu(self, e=None):
         return ft.Container(
@@ -4788,7 +5084,7 @@ class BudgetApp:
 
         # Update the UI with new avatar
         self.update_avatar_display()
-        self.page.update()
+        self.render.mark()
 
         # Show confirmation
         self.show_snack_bar(e.page, "Avatar updated successfully!")
@@ -4815,8 +5111,7 @@ class BudgetApp:
         # This depends on how your main UI is structured
         # For example, if you have a reference to your avatar container:
         self.main_avatar_container.content.src = self.current_avatar
-        self.page.update()
-        self.update_displays()
+        self.render.mark(self.main_avatar_container)
 
     def show_snack_bar(self, page, message):
         """Show a confirmation message"""
@@ -4833,14 +5128,8 @@ class BudgetApp:
         self.save_settings_to_file(self.settings_file, self.settings)
         try:
             print("saving avatar")
-            settings_data = {
-                "avatar_path": self.current_avatar,
-                }
-
-            # Save or update budget document
-            self.db.collection('users').document(self.user_id).collection('settings').document('avatar').\
-                set(settings_data)
-            print(f"✅ Avatar saved successfully: {settings_data}")
+            self.update_user_profile(self.user_id, 'avatar_path', self.current_avatar)
+            print(f"✅ Avatar saved successfully: {self.current_avatar}")
         except Exception as e:
             print(f'An exception occurred: {e}')
 
@@ -0,0 +1,126 @@
+import threading
+from google.cloud import firestore as fire
+
+from expense_sync import UPDATED_AT
+
+
+class RealtimeSync:
+    """Firestore snapshot listeners for a user's expenses, wish list and friend requests.
+
+    Instead of re-streaming whole collections, every snapshot is turned into a
+    document-level delta and handed to a callback:
+
+    - on_expenses(changed dicts, deleted ids, tombstone times)
+    - on_wishes(changed dicts, deleted ids)
+    - on_friend_requests()
+
+    Callbacks run on Firestore's listener threads, one at a time.
+    """
+
+    def __init__(self, db, user_id, on_expenses=None, on_wishes=None, on_friend_requests=None):
+        self.db = db
+        self.user_id = user_id
+        self.on_expenses = on_expenses
+        self.on_wishes = on_wishes
+        self.on_friend_requests = on_friend_requests
+        self._watches = []
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        return bool(self._watches)
+
+    @property
+    def user_ref(self):
+        return self.db.collection('users').document(self.user_id)
+
+    def start(self, expense_cursor=None, tombstone_cursor=None):
+        """Subscribe to the listeners, expenses and tombstones only from their cursors on when they are known"""
+        if self.active:
+            return
+
+        expenses_query = self.user_ref.collection('expenses')
+        if expense_cursor is not None:
+            expenses_query = expenses_query.where(filter=fire.FieldFilter(UPDATED_AT, '>=', expense_cursor))
+
+        # Documents older than the cursor never enter the expenses query, so their deletes arrive as tombstones
+        tombstones_query = self.user_ref.collection('expense_tombstones')
+        if tombstone_cursor is not None:
+            tombstones_query = tombstones_query.where(filter=fire.FieldFilter(UPDATED_AT, '>=', tombstone_cursor))
+
+        requests_query = (self.db.collection('friendRequests')
+                          .where(filter=fire.FieldFilter('to', '==', self.user_id))
+                          .where(filter=fire.FieldFilter('status', '==', 'pending')))
+
+        try:
+            self._watches = [
+                expenses_query.on_snapshot(self._expenses_snapshot),
+                tombstones_query.on_snapshot(self._tombstones_snapshot),
+                self.user_ref.collection('wish_list').on_snapshot(self._wishes_snapshot),
+                requests_query.on_snapshot(self._friend_requests_snapshot()),
+            ]
+            print(f"✅ Listening for changes of user {self.user_id}")
+        except Exception as e:
+            print(f"❌ Error starting snapshot listeners: {e}")
+            self.stop()
+
+    def stop(self):
+        watches, self._watches = self._watches, []
+        for watch in watches:
+            try:
+                watch.unsubscribe()
+            except Exception as e:
+                print(f"❌ Error stopping snapshot listener: {e}")
+
+    @staticmethod
+    def split_changes(changes):
+        """Split document changes into (changed dicts with 'id', removed ids)"""
+        changed = []
+        removed = []
+        for change in changes:
+            if change.type.name == 'REMOVED':
+                removed.append(change.document.id)
+            else:
+                data = change.document.to_dict()
+                data['id'] = change.document.id
+                changed.append(data)
+        return changed, removed
+
+    def _dispatch(self, callback, *args):
+        if not callback:
+            return
+        with self._lock:
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"❌ Error applying snapshot: {e}")
+
+    def _expenses_snapshot(self, docs, changes, read_time):
+        changed, removed = self.split_changes(changes)
+        if changed or removed:
+            self._dispatch(self.on_expenses, changed, removed, [])
+
+    def _tombstones_snapshot(self, docs, changes, read_time):
+        # A tombstone written again, after the expense was re-created and deleted, arrives as MODIFIED
+        deleted, _ = self.split_changes(change for change in changes if change.type.name in ('ADDED', 'MODIFIED'))
+        if deleted:
+            self._dispatch(self.on_expenses, [], [tombstone['id'] for tombstone in deleted],
+                           [tombstone.get(UPDATED_AT) for tombstone in deleted])
+
+    def _wishes_snapshot(self, docs, changes, read_time):
+        changed, removed = self.split_changes(changes)
+        if changed or removed:
+            self._dispatch(self.on_wishes, changed, removed)
+
+    def _friend_requests_snapshot(self):
+        first_snapshot = [True]
+
+        def on_snapshot(docs, changes, read_time):
+            # The first snapshot only repeats the requests the Friends tab has just loaded
+            if first_snapshot[0]:
+                first_snapshot[0] = False
+                return
+            if changes:
+                self._dispatch(self.on_friend_requests)
+
+        return on_snapshot
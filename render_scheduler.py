@@ -0,0 +1,86 @@
+import functools
+import threading
+from contextlib import contextmanager
+
+
+class RenderScheduler:
+    """Collects the controls an event handler changed and sends them in one update.
+
+    UI code marks what it changed instead of calling `page.update()`. Inside a
+    `batch()` the marks are only collected, and when the outermost batch ends
+    they are flushed with a single `page.update(*controls)`. Controls inside an
+    already marked control are dropped, and marking the page itself turns the
+    flush into one plain `page.update()`. Outside a batch a mark is flushed at
+    once, like the update call it replaces. Batches and marks are per thread.
+    """
+
+    def __init__(self, page):
+        self.page = page
+        # Flet runs handlers on a thread pool and the listeners run on their own threads,
+        # so every thread batches and flushes only the controls it marked itself
+        self._local = threading.local()
+
+    @property
+    def _dirty(self):
+        if not hasattr(self._local, 'dirty'):
+            self._local.dirty = []
+        return self._local.dirty
+
+    def mark(self, *controls):
+        """Schedule `controls`, the whole page when none are given, for the next flush"""
+        dirty = self._dirty
+        for control in controls or (self.page,):
+            if control is not None and not any(control is marked for marked in dirty):
+                dirty.append(control)
+        if getattr(self._local, 'depth', 0) == 0:
+            self.flush()
+
+    @contextmanager
+    def batch(self):
+        self._local.depth = getattr(self._local, 'depth', 0) + 1
+        try:
+            yield self
+        finally:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                self.flush()
+
+    def batched(self, handler):
+        """`handler` running inside a batch, for event handlers defined as closures"""
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            with self.batch():
+                return handler(*args, **kwargs)
+        return wrapper
+
+    def flush(self):
+        dirty, self._local.dirty = self._dirty, []
+        if not dirty or not self.page:
+            return
+        if any(control is self.page for control in dirty):
+            self.page.update()
+            return
+
+        dirty_ids = {id(control) for control in dirty}
+        controls = [control for control in dirty
+                    if control.page and not self._has_dirty_ancestor(control, dirty_ids)]
+        if controls:
+            self.page.update(*controls)
+
+    @staticmethod
+    def _has_dirty_ancestor(control, dirty_ids):
+        parent = control.parent
+        while parent is not None:
+            if id(parent) in dirty_ids:
+                return True
+            parent = parent.parent
+        return False
+
+
+def in_render_batch(method):
+    """Run a method of an object with a `render` scheduler inside one batch"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.render.batch():
+            return method(self, *args, **kwargs)
+    return wrapper
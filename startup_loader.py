@@ -0,0 +1,55 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+class StartupLoader:
+    """Runs independent data loaders concurrently and records a start-up timeline.
+
+    Every loader is I/O bound (a Firestore round-trip), so a thread pool brings the
+    total wait down from the sum of the loaders to roughly the slowest one.
+    """
+
+    def __init__(self, max_workers=5):
+        self.max_workers = max_workers
+        self.timeline = []
+        self.total_duration = 0.0
+
+    def run(self, tasks, on_task_done=None):
+        """Run `tasks` (name -> callable) in parallel and return the timeline.
+
+        Each timeline entry is (name, start offset, duration) in seconds. A loader
+        raising does not stop the others; `on_task_done(name)` is called as each
+        one finishes, on the thread that collects the results.
+        """
+        started = time.perf_counter()
+
+        def timed(name, loader):
+            begin = time.perf_counter()
+            try:
+                loader()
+            except Exception as e:
+                print(f"❌ Start-up loader '{name}' failed: {e}")
+            return name, begin - started, time.perf_counter() - begin
+
+        timeline = []
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(tasks)))) as pool:
+            futures = [pool.submit(timed, name, loader) for name, loader in tasks.items()]
+            for future in as_completed(futures):
+                entry = future.result()
+                timeline.append(entry)
+                if on_task_done:
+                    try:
+                        on_task_done(entry[0])
+                    except Exception as e:
+                        print(f"❌ Start-up callback for '{entry[0]}' failed: {e}")
+
+        self.timeline = sorted(timeline, key=lambda entry: entry[1])
+        self.total_duration = time.perf_counter() - started
+        self.print_timeline()
+        return self.timeline
+
+    def print_timeline(self):
+        sequential = sum(duration for _, _, duration in self.timeline)
+        print(f"⏱️ Start-up loaded in {self.total_duration:.3f}s (sequential would be ~{sequential:.3f}s)")
+        for name, offset, duration in self.timeline:
+            print(f"   {name:<10} +{offset:.3f}s  {duration:.3f}s")
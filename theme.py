@@ -1,125 +1,116 @@
-import flet as ft
-
-class Themecolors:
-    def __init__(self, page):
-        self.page = page
-
-    @property
-    def is_dark(self):
-        return self.page.theme_mode == ft.ThemeMode.DARK
-
-    @property
-    def text_primary(self):
-        return ft.colors.WHITE70 if self.is_dark else ft.colors.GREY_800
-
-    @property
-    def text_logo(self):
-        return ft.colors.WHITE24 if self.is_dark else ft.colors.WHITE
-
-    @property
-    def text_secondary(self):
-        return ft.colors.GREY_300 if self.is_dark else ft.colors.GREY_600
+import dataclasses
 
-    @property
-    def blue_text(self):
-        return ft.colors.BLUE_300 if self.is_dark else ft.colors.BLUE_600
-
-    @property
-    def purple_text(self):
-        return ft.colors.PURPLE_200 if self.is_dark else ft.colors.PURPLE_400
-
-    @property
-    def background(self):
-        return ft.colors.GREY_900 if self.is_dark else ft.colors.GREY_50
-
-    @property
-    def button_background(self):
-        return ft.colors.GREY_700 if self.is_dark else ft.colors.GREY_100
-
-    @property
-    def auth_background_primary(self):
-        return ft.colors.TEAL_800 if self.is_dark else ft.colors.TEAL_400
-
-    @property
-    def auth_background_secondary(self):
-        return ft.colors.GREY_800 if self.is_dark else ft.colors.TEAL_800
-
-    @property
-    def auth_background_midle(self):
-        return ft.colors.TEAL_900 if self.is_dark else ft.colors.TEAL_600
-
-    @property
-    def logo_primary(self):
-        return ft.colors.GREY_400 if self.is_dark else ft.colors.WHITE
+import flet as ft
 
-    @property
-    def logo_on_orange(self):
-        return ft.colors.ORANGE_100 if self.is_dark else ft.colors.ORANGE_700
 
-    @property
-    def logo_on_blue(self):
-        return ft.colors.BLUE_50 if self.is_dark else ft.colors.BLUE
+class ThemeColor(str):
+    """A color handed out by Themecolors, it remembers the palette entry it came from"""
 
-    @property
-    def logo_in_blue(self):
-        return ft.colors.BLUE_100 if self.is_dark else ft.colors.BLUE_700
+    def __new__(cls, value, token):
+        color = super().__new__(cls, getattr(value, 'value', value))
+        color.token = token
+        return color
 
-    @property
-    def sign_in(self):
-        return ft.colors.DEEP_ORANGE_800 if self.is_dark else ft.colors.DEEP_ORANGE_300
 
-    @property
-    def teal_card(self):
-        return ft.colors.TEAL_800 if self.is_dark else ft.colors.TEAL_50
+class ThemeToken:
+    """A palette entry with its dark and light mode colors"""
 
-    @property
-    def teal_text(self):
-        return ft.colors.TEAL_ACCENT_700 if self.is_dark else ft.colors.TEAL_ACCENT_400
+    def __init__(self, dark, light):
+        self.dark = dark
+        self.light = light
 
-    @property
-    def teal_text_secondary(self):
-        return ft.colors.TEAL_300 if self.is_dark else ft.colors.TEAL_600
+    def __set_name__(self, owner, name):
+        self.name = name
 
-    @property
-    def orange_card(self):
-        return ft.colors.DEEP_ORANGE_800 if self.is_dark else ft.colors.ORANGE_50
-
-    @property
-    def green_card(self):
-        return ft.colors.GREEN_900 if self.is_dark else ft.colors.GREEN_50
+    def __get__(self, theme, owner=None):
+        if theme is None:
+            return self
+        return ThemeColor(self.dark if theme.is_dark else self.light, self.name)
 
-    @property
-    def red_card(self):
-        return ft.colors.RED_800 if self.is_dark else ft.colors.RED_50
 
-    @property
-    def purple_card(self):
-        return ft.colors.PURPLE_800 if self.is_dark else ft.colors.PURPLE_50
-
-    @property
-    def blue_card(self):
-        return ft.colors.BLUE_800 if self.is_dark else ft.colors.BLUE_50
-
-    @property
-    def cyan_card(self):
-        return ft.colors.CYAN_800 if self.is_dark else ft.colors.CYAN_50
-
-    @property
-    def yellow_card(self):
-        return ft.colors.YELLOW_900 if self.is_dark else ft.colors.YELLOW_100
-
-    @property
-    def pink_card(self):
-        return ft.colors.PINK_900 if self.is_dark else ft.colors.PINK_100
-
-    @property
-    def progress_bar(self):
-        return ft.colors.GREY_400 if self.is_dark else ft.colors.GREY_100
+class Themecolors:
+    def __init__(self, page):
+        self.page = page
 
     @property
-    def container_primary(self):
-        return ft.colors.GREY_200 if self.is_dark else ft.colors.GREY_50
+    def is_dark(self):
+        return self.page.theme_mode == ft.ThemeMode.DARK
 
-    @property
-    def surface(self):
-        return ft.colors.GREY_800 if self.is_dark else ft.colors.WHITE
\ No newline at end of file
+    text_primary = ThemeToken(dark=ft.colors.WHITE70, light=ft.colors.GREY_800)
+    text_logo = ThemeToken(dark=ft.colors.WHITE24, light=ft.colors.WHITE)
+    text_secondary = ThemeToken(dark=ft.colors.GREY_300, light=ft.colors.GREY_600)
+    blue_text = ThemeToken(dark=ft.colors.BLUE_300, light=ft.colors.BLUE_600)
+    purple_text = ThemeToken(dark=ft.colors.PURPLE_200, light=ft.colors.PURPLE_400)
+    background = ThemeToken(dark=ft.colors.GREY_900, light=ft.colors.GREY_50)
+    button_background = ThemeToken(dark=ft.colors.GREY_700, light=ft.colors.GREY_100)
+    auth_background_primary = ThemeToken(dark=ft.colors.TEAL_800, light=ft.colors.TEAL_400)
+    auth_background_secondary = ThemeToken(dark=ft.colors.GREY_800, light=ft.colors.TEAL_800)
+    auth_background_midle = ThemeToken(dark=ft.colors.TEAL_900, light=ft.colors.TEAL_600)
+    logo_primary = ThemeToken(dark=ft.colors.GREY_400, light=ft.colors.WHITE)
+    logo_on_orange = ThemeToken(dark=ft.colors.ORANGE_100, light=ft.colors.ORANGE_700)
+    logo_on_blue = ThemeToken(dark=ft.colors.BLUE_50, light=ft.colors.BLUE)
+    logo_in_blue = ThemeToken(dark=ft.colors.BLUE_100, light=ft.colors.BLUE_700)
+    sign_in = ThemeToken(dark=ft.colors.DEEP_ORANGE_800, light=ft.colors.DEEP_ORANGE_300)
+    teal_card = ThemeToken(dark=ft.colors.TEAL_800, light=ft.colors.TEAL_50)
+    teal_text = ThemeToken(dark=ft.colors.TEAL_ACCENT_700, light=ft.colors.TEAL_ACCENT_400)
+    teal_text_secondary = ThemeToken(dark=ft.colors.TEAL_300, light=ft.colors.TEAL_600)
+    orange_card = ThemeToken(dark=ft.colors.DEEP_ORANGE_800, light=ft.colors.ORANGE_50)
+    green_card = ThemeToken(dark=ft.colors.GREEN_900, light=ft.colors.GREEN_50)
+    red_card = ThemeToken(dark=ft.colors.RED_800, light=ft.colors.RED_50)
+    purple_card = ThemeToken(dark=ft.colors.PURPLE_800, light=ft.colors.PURPLE_50)
+    blue_card = ThemeToken(dark=ft.colors.BLUE_800, light=ft.colors.BLUE_50)
+    cyan_card = ThemeToken(dark=ft.colors.CYAN_800, light=ft.colors.CYAN_50)
+    yellow_card = ThemeToken(dark=ft.colors.YELLOW_900, light=ft.colors.YELLOW_100)
+    pink_card = ThemeToken(dark=ft.colors.PINK_900, light=ft.colors.PINK_100)
+    progress_bar = ThemeToken(dark=ft.colors.GREY_400, light=ft.colors.GREY_100)
+    container_primary = ThemeToken(dark=ft.colors.GREY_200, light=ft.colors.GREY_50)
+    surface = ThemeToken(dark=ft.colors.GREY_800, light=ft.colors.WHITE)
+
+    def recolor(self, control=None):
+        """Swap every palette color shown under `control` (the whole page by default) for the current mode's.
+
+        Controls are changed in place and marked dirty, so after a theme mode switch
+        one update sends just the new colors, without rebuilding any view.
+
+        This reads Flet's private property table (`_Control__attrs`, `_set_attr`,
+        `_get_children`) as laid out in flet 0.28.x. Returns False without changing
+        anything when the table is not there, the caller then has to rebuild its views.
+        """
+        if not hasattr(control or self.page, '_Control__attrs'):
+            return False
+        stack = [control or self.page]
+        seen = set()
+        while stack:
+            control = stack.pop()
+            if id(control) in seen:
+                continue
+            seen.add(id(control))
+            # Flet keeps a control's own properties in its private attribute table
+            for name, (value, _) in list(getattr(control, '_Control__attrs', {}).items()):
+                if isinstance(value, ThemeColor):
+                    control._set_attr(name, getattr(self, value.token))
+            # Other properties, borders, shadows and styles are kept as plain attributes that
+            # the control serializes on update
+            for name, value in list(vars(control).items()):
+                if isinstance(value, ThemeColor):
+                    vars(control)[name] = getattr(self, value.token)
+                elif name != '_Control__attrs' and not isinstance(value, ft.Control):
+                    self._recolor_value(value)
+            stack.extend(control._get_children())
+        return True
+
+    def _recolor_value(self, value):
+        if isinstance(value, (list, dict)):
+            items = value.items() if isinstance(value, dict) else enumerate(value)
+            for key, item in list(items):
+                if isinstance(item, ThemeColor):
+                    value[key] = getattr(self, item.token)
+                elif not isinstance(item, ft.Control):
+                    self._recolor_value(item)
+        elif dataclasses.is_dataclass(value) and not isinstance(value, type):
+            for field in dataclasses.fields(value):
+                item = getattr(value, field.name)
+                if isinstance(item, ThemeColor):
+                    object.__setattr__(value, field.name, getattr(self, item.token))
+                elif not isinstance(item, ft.Control):
+                    self._recolor_value(item)
@@ -0,0 +1,61 @@
+import heapq
+from bisect import bisect_left, insort
+from itertools import islice
+
+
+class TopExpenses:
+    """The largest expenses of any day range, kept as per-day lists sorted by amount.
+
+    Adding or removing an expense is an insort into the list of its day. Reading
+    the K largest of a window lazily merges the sorted lists of the window's days
+    and stops after K entries, instead of sorting every expense of the window.
+    Reads are cached until the next change, so repeated reads are O(K).
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.day_entries = {}  # day -> [(-amount, expense id)] ascending, i.e. largest first
+        self.days = []
+        self._cache = {}
+
+    def add(self, day, expense_id, amount):
+        entries = self.day_entries.get(day)
+        if entries is None:
+            entries = self.day_entries[day] = []
+            insort(self.days, day)
+        insort(entries, (-amount, expense_id))
+        self._cache.clear()
+
+    def remove(self, day, expense_id, amount):
+        entries = self.day_entries.get(day)
+        if not entries:
+            return
+        index = bisect_left(entries, (-amount, expense_id))
+        if index < len(entries) and entries[index] == (-amount, expense_id):
+            del entries[index]
+        if not entries:
+            del self.day_entries[day]
+            del self.days[bisect_left(self.days, day)]
+        self._cache.clear()
+
+    def rebuild(self, rows):
+        """Replace the contents with (day, expense id, amount) rows"""
+        self.clear()
+        for day, expense_id, amount in rows:
+            self.day_entries.setdefault(day, []).append((-amount, expense_id))
+        for entries in self.day_entries.values():
+            entries.sort()
+        self.days = sorted(self.day_entries)
+
+    def largest(self, k, since_day=None, until_day=None):
+        """[(expense id, amount)] of the `k` largest expenses dated in days [since_day, until_day)"""
+        key = (k, since_day, until_day)
+        cached = self._cache.get(key)
+        if cached is None:
+            first = 0 if since_day is None else bisect_left(self.days, since_day)
+            end = len(self.days) if until_day is None else bisect_left(self.days, until_day)
+            merged = heapq.merge(*(self.day_entries[day] for day in self.days[first:end]))
+            cached = self._cache[key] = [(expense_id, -amount) for amount, expense_id in islice(merged, k)]
+        return cached
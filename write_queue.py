@@ -0,0 +1,168 @@
+import queue
+import secrets
+import string
+import threading
+from google.api_core import exceptions as api_exceptions
+
+# Firestore allows at most 500 writes in one batch
+MAX_BATCH_WRITES = 500
+RETRY_DELAY = 2
+MAX_RETRY_DELAY = 60
+
+# Errors worth retrying, anything else means the writes can never succeed
+TRANSIENT_ERRORS = (
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.DeadlineExceeded,
+    api_exceptions.InternalServerError,
+    api_exceptions.TooManyRequests,
+    api_exceptions.Aborted,
+    api_exceptions.Unknown,
+    api_exceptions.RetryError,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+AUTO_ID_CHARS = string.ascii_letters + string.digits
+
+
+def new_document_id():
+    """A 20 character id in the format of Firestore auto ids, generated without a connection"""
+    return ''.join(secrets.choice(AUTO_ID_CHARS) for _ in range(20))
+
+
+def set_write(path, data, merge=False):
+    """Write `data` to the document at `path`, the local 'id' key is not stored"""
+    return {'op': 'set', 'path': path, 'data': {key: value for key, value in data.items() if key != 'id'},
+            'merge': merge}
+
+
+def delete_write(path):
+    return {'op': 'delete', 'path': path}
+
+
+class WriteBehindQueue:
+    """Commits groups of related Firestore writes off the UI thread.
+
+    Every group (e.g. an expense and the friend's copy of it) is journaled in the
+    local store, then committed atomically in a WriteBatch by a background worker.
+    Consecutive groups are coalesced into one batch, transient failures are retried
+    with backoff, and groups still in the journal are replayed on the next start.
+
+    Writes only use client-generated ids, `set(merge=True)` and deletes, so replaying
+    a group that already reached Firestore is harmless. Without a client (`db` is
+    None) groups are only journaled until `attach` is called.
+    """
+
+    def __init__(self, db=None, store=None):
+        self.db = db
+        self.store = store
+        self._connected = threading.Event()
+        self._wake = threading.Event()
+        if db is not None:
+            self._connected.set()
+        self._queue = queue.Queue()
+        self._unfinished = 0
+        self._unfinished_lock = threading.Lock()
+        self._idle = threading.Event()
+        self._idle.set()
+
+        if self.store:
+            for seq, writes in self.store.load_pending_writes():
+                self._put(seq, writes)
+            if not self._queue.empty():
+                print(f"🔄 Resuming {self._queue.qsize()} pending write groups")
+
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def attach(self, db):
+        """Start committing with `db` once a Firestore client is available"""
+        self.db = db
+        self._connected.set()
+
+    def retry_now(self):
+        """Skip the current backoff, e.g. after Firestore answered again"""
+        self._wake.set()
+
+    def enqueue(self, writes):
+        """Queue a group of writes that must commit together"""
+        writes = [write for write in writes if write]
+        if not writes:
+            return
+        seq = self.store.add_pending_writes(writes) if self.store else None
+        self._put(seq, writes)
+
+    def _put(self, seq, writes):
+        with self._unfinished_lock:
+            self._unfinished += 1
+            self._idle.clear()
+        self._queue.put((seq, writes))
+
+    def _done(self, count):
+        with self._unfinished_lock:
+            self._unfinished -= count
+            if self._unfinished == 0:
+                self._idle.set()
+
+    def wait_until_idle(self, timeout=None):
+        """Block until every queued group has been committed or dropped"""
+        return self._idle.wait(timeout)
+
+    def _run(self):
+        next_group = None
+        self._connected.wait()
+        while True:
+            groups = [next_group or self._queue.get()]
+            next_group = None
+            size = len(groups[0][1])
+            while True:
+                try:
+                    group = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if size + len(group[1]) > MAX_BATCH_WRITES:
+                    # Commit in order: this group starts the next batch
+                    next_group = group
+                    break
+                groups.append(group)
+                size += len(group[1])
+
+            self._commit_with_retry(groups)
+            self._done(len(groups))
+
+    def _commit_with_retry(self, groups):
+        delay = RETRY_DELAY
+        while True:
+            try:
+                self._commit(groups)
+                return
+            except TRANSIENT_ERRORS as e:
+                print(f"⚠️ Firestore write failed, retrying in {delay}s: {e}")
+                self._wake.wait(delay)
+                self._wake.clear()
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+            except Exception as e:
+                if len(groups) > 1:
+                    # Find the group that can never succeed without losing the others
+                    for group in groups:
+                        self._commit_with_retry([group])
+                    return
+                print(f"❌ Dropping writes that Firestore rejected: {e}")
+                if self.store:
+                    self.store.remove_pending_writes([groups[0][0]])
+                return
+
+    def _commit(self, groups):
+        batch = self.db.batch()
+        for _, writes in groups:
+            for write in writes:
+                ref = self.db.document(write['path'])
+                if write['op'] == 'set':
+                    batch.set(ref, write['data'], merge=write.get('merge', False))
+                elif write['op'] == 'delete':
+                    batch.delete(ref)
+        batch.commit()
+
+        if self.store:
+            self.store.remove_pending_writes([seq for seq, _ in groups])